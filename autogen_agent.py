@@ -1,20 +1,30 @@
 import os
 import sys
 import asyncio
-import traceback
+import contextlib
+import hashlib
+import logging
 import json
+import operator
+import threading
+import warnings
+import importlib.util
 from dotenv import load_dotenv
-from typing import Dict, Any, Optional, List
+from typing import TYPE_CHECKING, Dict, Any, Optional, List, Callable, Awaitable
 
-# Import MCP components using the reference provided in the Qiita article
-from autogen_ext.models.openai import AzureOpenAIChatCompletionClient
-from autogen_core import CancellationToken  # NOTE: Agentを途中でキャンセル可能 → エージェントの回答生成途中にユーザから新しいメッセージが来たらCancel実行などの使い道?エージェントの応答が遅すぎるときも例外処理としてこれ投げれば良い
-from autogen_core._types import FunctionCall
-from autogen_core.models import FunctionExecutionResult
-from autogen_agentchat.messages import ToolCallSummaryMessage, TextMessage, ToolCallRequestEvent, ToolCallExecutionEvent
+# autogen, the agents and httpx are imported where they are first needed so that
+# the CLI starts (and exits on 'exit'/'quit') without loading the full autogen stack.
+# NOTE: autogen_core.CancellationToken: Agentを途中でキャンセル可能 → エージェントの回答生成途中にユーザから新しいメッセージが来たらCancel実行などの使い道?エージェントの応答が遅すぎるときも例外処理としてこれ投げれば良い
+from mcp_agents.semantic_cache import SemanticCache
 
-# Import the AgentManager class
-from mcp_agents import AgentManager
+if TYPE_CHECKING:
+    import httpx
+    from autogen_agentchat.messages import ToolCallSummaryMessage, TextMessage, ToolCallRequestEvent, ToolCallExecutionEvent
+
+logger = logging.getLogger(__name__)
+
+# Suppress UserWarnings emitted by autogen while chats run
+warnings.filterwarnings("ignore", category=UserWarning)
 
 # Load environment variables
 load_dotenv()
@@ -25,6 +35,15 @@ AZURE_ENDPOINT = os.getenv("AZURE_OPENAI_ENDPOINT")
 AZURE_API_VERSION = os.getenv("AZURE_OPENAI_API_VERSION", "2024-02-01")
 AZURE_DEPLOYMENT = os.getenv("AZURE_OPENAI_DEPLOYMENT_NAME")
 AZURE_MODEL = os.getenv("AZURE_OPENAI_MODEL", "gpt-4o")
+# Optional embedding deployment used to match paraphrased queries in the response cache
+AZURE_EMBEDDING_DEPLOYMENT = os.getenv("AZURE_OPENAI_EMBEDDING_DEPLOYMENT")
+# Responses are only written to disk when a path is set; they are served for RESPONSE_CACHE_TTL seconds
+RESPONSE_CACHE_PATH = os.getenv("RESPONSE_CACHE_PATH") or None
+RESPONSE_CACHE_TTL = float(os.getenv("RESPONSE_CACHE_TTL", "3600"))
+# Speculatively answer likely follow-up questions while the user is typing
+PREFETCH_FOLLOWUPS = os.getenv("PREFETCH_FOLLOWUPS", "false").lower() == "true"
+# Maximum number of chat events buffered between the model stream and the output
+STREAM_QUEUE_SIZE = 64
 
 # Configure which agents to use in the chat
 # Set to True to enable an agent, False to disable
@@ -36,72 +55,105 @@ ENABLED_AGENTS = {
     # "custom_agent": False    # Custom agent example
 }
 
-def extract_content(response, default_message="No response content available"):
-    """Extract content from various response types including TaskResult objects"""
-    # Check without printing debug info
-    response_type = str(type(response))
+# Shared HTTP connection pool for all Azure OpenAI calls in this process
+_http_client: Optional["httpx.AsyncClient"] = None
+
+def get_http_client() -> "httpx.AsyncClient":
+    """
+    Return the shared HTTP client, creating it on first use.
     
-    # Check if it's likely a TaskResult by type name instead of using isinstance
-    if "TaskResult" in response_type:
-        # If it has message attribute that contains content
-        if hasattr(response, 'message') and response.message:
-            if hasattr(response.message, 'content') and response.message.content:
-                return response.message.content
-        
-        # If it has content attribute directly
-        if hasattr(response, 'content') and response.content:
-            return response.content
-        
-        # If it has output attribute
-        if hasattr(response, 'output') and response.output:
-            return response.output
-            
-        # Try string representation as last resort
-        return str(response)
+    Keep-alive connections let planner and worker turns reuse warm TLS connections.
+    HTTP/2 multiplexing is enabled when the optional h2 package is installed.
+    """
+    global _http_client
+    if _http_client is None:
+        import httpx
+        _http_client = httpx.AsyncClient(
+            http2=importlib.util.find_spec("h2") is not None,
+            limits=httpx.Limits(max_connections=100, max_keepalive_connections=32, keepalive_expiry=60),
+            timeout=httpx.Timeout(600, connect=5),
+        )
+    return _http_client
+
+_response_cache: Optional[SemanticCache] = None
+
+def get_response_cache() -> SemanticCache:
+    """Return the shared response cache, creating it on first use"""
+    global _response_cache
+    if _response_cache is None:
+        if AZURE_EMBEDDING_DEPLOYMENT:
+            from openai import AsyncAzureOpenAI
+            embedding_client = AsyncAzureOpenAI(
+                api_key=AZURE_API_KEY,
+                api_version=AZURE_API_VERSION,
+                azure_endpoint=AZURE_ENDPOINT,
+                http_client=get_http_client(),
+            )
+
+            async def _azure_embed(text: str) -> List[float]:
+                result = await embedding_client.embeddings.create(model=AZURE_EMBEDDING_DEPLOYMENT, input=text)
+                return result.data[0].embedding
+
+        embed_fn = _azure_embed if AZURE_EMBEDDING_DEPLOYMENT else None
+        _response_cache = SemanticCache(embed_fn=embed_fn, path=RESPONSE_CACHE_PATH, ttl=RESPONSE_CACHE_TTL)
+    return _response_cache
+
+def response_cache_scope(agent_manager=None, last_exchange: Optional[tuple] = None) -> str:
+    """
+    Name the enabled agents, so cached answers are not replayed to a different team.
     
-    # If it's a string already
-    if isinstance(response, str):
-        return response
-        
-    # If it's a dict with content
-    if isinstance(response, dict) and 'content' in response:
-        return response['content']
-        
-    # Last resort - convert to string 
-    return str(response) if response else default_message
+    Follow-up answers are also scoped to the (query, response) exchange they follow.
+    """
+    agent_manager = agent_manager or _agent_cache.get("agent_manager")
+    config = agent_manager.agent_config if agent_manager else ENABLED_AGENTS
+    scope = ",".join(sorted(name for name, is_enabled in config.items() if is_enabled))
+    if last_exchange:
+        scope += ":" + hashlib.sha256("\0".join(last_exchange).encode("utf-8")).hexdigest()
+    return scope
+
+# Module-level cache of the model client, agent manager and chat so that the
+# MCP tool subprocesses and agents are initialized once per process
+_agent_cache: Dict[str, Any] = {}
+_agent_cache_lock = asyncio.Lock()
 
-async def process_query(query: str, chat=None, model_client=None, agent_manager=None) -> tuple:
+_model_client_lock = asyncio.Lock()
+
+async def get_model_client():
     """
-    Process the user's query using a SelectorGroupChat with planner and specialized agents.
+    Return the process-wide Azure OpenAI model client, creating it on first use.
     
-    Args:
-        query: The user's query
-        chat: Optional existing chat session
-        model_client: Optional existing model client
-        agent_manager: Optional existing agent manager
-        
-    Returns:
-        Tuple of (response, chat, model_client, agent_manager) for maintaining session state
+    Reusing one client keeps its HTTP connection pool warm across queries.
     """
-    try:
-        # Suppress warnings temporarily
-        import warnings
-        warnings.filterwarnings("ignore", category=UserWarning)
-        
-        # Create model client if not provided
+    async with _model_client_lock:
+        model_client = _agent_cache.get("model_client")
         if model_client is None:
+            # Import MCP components using the reference provided in the Qiita article
+            from autogen_ext.models.openai import AzureOpenAIChatCompletionClient
             model_client = AzureOpenAIChatCompletionClient(
                 azure_deployment=AZURE_DEPLOYMENT,
                 api_key=AZURE_API_KEY,
                 api_version=AZURE_API_VERSION,
                 azure_endpoint=AZURE_ENDPOINT,
                 model=AZURE_MODEL,
+                http_client=get_http_client(),
             )
-        
-        # Create chat if not provided
-        if chat is None:
-            # Create agent manager if not provided
+            _agent_cache["model_client"] = model_client
+        return model_client
+
+async def get_chat() -> tuple:
+    """
+    Return the cached chat session, initializing it on first use.
+    
+    Returns:
+        Tuple of (chat, model_client, agent_manager); chat is None if no agents could be initialized
+    """
+    async with _agent_cache_lock:
+        if _agent_cache.get("chat") is None:
+            model_client = await get_model_client()
+            
+            agent_manager = _agent_cache.get("agent_manager")
             if agent_manager is None:
+                from mcp_agents import AgentManager
                 agent_manager = AgentManager(model_client)
                 
                 # Example of how to register a custom agent:
@@ -114,59 +166,381 @@ async def process_query(query: str, chat=None, model_client=None, agent_manager=
                 
                 # Configure which agents to use
                 agent_manager.configure_agents(ENABLED_AGENTS)
+                _agent_cache["agent_manager"] = agent_manager
             
-            # Create the chat with the agent manager
-            chat = await agent_manager.create_chat()
+            _agent_cache["chat"] = await agent_manager.create_chat()
+        
+        return _agent_cache["chat"], _agent_cache["model_client"], _agent_cache["agent_manager"]
+
+async def get_prefetch_chat():
+    """Return a separate cached chat used for speculative queries, so they never touch the user's session"""
+    _, _, agent_manager = await get_chat()
+    async with _agent_cache_lock:
+        if _agent_cache.get("prefetch_chat") is None:
+            # Agents keep per-conversation state, so the prefetch chat gets its own
+            _agent_cache["prefetch_chat"] = await agent_manager.create_chat(reuse_agents=False)
+        return _agent_cache["prefetch_chat"]
+
+def invalidate_chat():
+    """Drop the cached chat so the next query rebuilds it with the current agent configuration"""
+    _agent_cache.pop("chat", None)
+    _agent_cache.pop("prefetch_chat", None)
+
+async def close_chat():
+    """Release the MCP sessions, the cached model client and the shared HTTP connection pool on shutdown"""
+    global _http_client
+    model_client = _agent_cache.pop("model_client", None)
+    agent_manager = _agent_cache.pop("agent_manager", None)
+    _agent_cache.clear()
+    if agent_manager is not None:
+        await agent_manager.close()
+    if model_client is not None:
+        await model_client.close()
+    if _http_client is not None:
+        await _http_client.aclose()
+        _http_client = None
+
+# AssistantAgent executes every call in a request concurrently, so the whole
+# batch is reported at once rather than only the first call
+def _format_tool_call_request(message: "ToolCallRequestEvent") -> str:
+    calls = "\n ".join(str(call) for call in message.content)
+    return f"Function calling...\n {calls}"
+
+def _format_tool_call_execution(message: "ToolCallExecutionEvent") -> str:
+    return f"Fetched {len(message.content)} function result(s)..."
+
+def _format_tool_call_summary(message: "ToolCallSummaryMessage") -> str:
+    return "Summarizing tool call..."
+
+def _format_text(message: "TextMessage") -> str:
+    return message.content
+
+# Formatters rendering the body of each message type shown while a chat runs,
+# keyed by exact type so the stream loop does a single dict lookup per message.
+# Filled on first use to keep autogen out of the import path.
+_MESSAGE_FORMATTERS: Dict[type, Callable[[Any], str]] = {}
+
+def _load_message_formatters() -> Dict[type, Callable[[Any], str]]:
+    """Return the formatter table, building it on first use"""
+    if not _MESSAGE_FORMATTERS:
+        from autogen_agentchat.messages import ToolCallSummaryMessage, TextMessage, ToolCallRequestEvent, ToolCallExecutionEvent
+        _MESSAGE_FORMATTERS.update({
+            ToolCallRequestEvent: _format_tool_call_request,
+            ToolCallExecutionEvent: _format_tool_call_execution,
+            ToolCallSummaryMessage: _format_tool_call_summary,
+            TextMessage: _format_text,
+        })
+    return _MESSAGE_FORMATTERS
+
+# Attribute paths probed on TaskResult-like objects, in priority order
+_TASK_RESULT_GETTERS = (
+    operator.attrgetter("message.content"),
+    operator.attrgetter("content"),
+    operator.attrgetter("output"),
+)
+
+# Getter that last succeeded for each TaskResult type, so later calls skip the probing
+_extractors: Dict[type, Callable[[Any], Any]] = {}
+
+def _extract_task_result(response):
+    """Extract content from a TaskResult-like object, remembering the attribute path per type"""
+    response_type = type(response)
+    
+    getter = _extractors.get(response_type)
+    if getter is not None:
+        try:
+            value = getter(response)
+        except AttributeError:
+            value = None
+        if value:
+            return value
+    
+    for getter in _TASK_RESULT_GETTERS:
+        try:
+            value = getter(response)
+        except AttributeError:
+            continue
+        if value:
+            _extractors[response_type] = getter
+            return value
+    
+    # Try string representation as last resort
+    return str(response)
+
+def extract_content(response, default_message="No response content available"):
+    """Extract content from various response types including TaskResult objects"""
+    # Most callers already pass the final text
+    if isinstance(response, str):
+        return response
+    
+    # Compare type names so autogen does not have to be imported here
+    type_name = type(response).__name__
+    if type_name == "TextMessage":
+        return response.content
+    if type_name == "TaskResult":
+        return _extract_task_result(response)
+        
+    # If it's a dict with content
+    if isinstance(response, dict) and 'content' in response:
+        return response['content']
+        
+    # Last resort - convert to string 
+    return str(response) if response else default_message
+
+# Sources of the task messages built by replay_task
+_USER_SOURCE = "user"
+_REPLAYED_RESPONSE_SOURCE = "assistant"
+_TASK_SOURCES = (_USER_SOURCE, _REPLAYED_RESPONSE_SOURCE)
+
+def select_response(messages: List[Any]) -> Optional[str]:
+    """
+    Pick the final answer from the messages of a chat run.
+    
+    Tool call events are progress only; answers come from chat messages. The last
+    message from a worker agent (not the planner) is the answer, or the last message
+    if only the planner spoke.
+    
+    Returns:
+        The answer, or None if the run produced no chat message
+    """
+    from autogen_agentchat.messages import TextMessage, ToolCallSummaryMessage
+    last_any_content: Optional[str] = None
+    for message in reversed(messages):
+        # The run also echoes its task, including any replayed exchanges
+        if type(message) not in (TextMessage, ToolCallSummaryMessage) or message.source in _TASK_SOURCES:
+            continue
+        if message.source != "planner":
+            return message.content.strip()
+        if last_any_content is None:
+            last_any_content = message.content
+    return last_any_content.strip() if last_any_content is not None else None
+
+async def write_token(chunk: str):
+    """Write a streamed chunk to stdout as soon as it arrives"""
+    sys.stdout.write(chunk)
+    sys.stdout.flush()
+
+def replay_task(query: str, history: Optional[List[tuple]] = None):
+    """Build a task that replays earlier (query, response) exchanges ahead of the query"""
+    if not history:
+        return query
+    
+    from autogen_agentchat.messages import TextMessage
+    messages = []
+    for past_query, past_response in history:
+        messages.append(TextMessage(content=past_query, source=_USER_SOURCE))
+        messages.append(TextMessage(content=past_response, source=_REPLAYED_RESPONSE_SOURCE))
+    messages.append(TextMessage(content=query, source=_USER_SOURCE))
+    return messages
+
+async def process_query(query: str, chat=None, model_client=None, agent_manager=None,
+                        on_token: Optional[Callable[[str], Awaitable[None]]] = None,
+                        history: Optional[List[tuple]] = None) -> tuple:
+    """
+    Process the user's query using a SelectorGroupChat with planner and specialized agents.
+    
+    Args:
+        query: The user's query
+        chat: Optional existing chat session; it must have seen every exchange in history
+        model_client: Optional existing model client
+        agent_manager: Optional existing agent manager
+        on_token: Optional async callback receiving model output chunks as they are generated.
+            When set, streamed text is not printed again once the full message arrives.
+        history: Earlier (query, response) exchanges of this session. They are replayed
+            to a new chat so that follow-up questions keep their context.
+        
+    Returns:
+        Tuple of (response, chat, model_client, agent_manager) for maintaining session state.
+        chat is None after a cached response, since the chat has not seen that exchange.
+    """
+    # Only a query that starts a session stands on its own. Inside a session, inputs
+    # such as "yes" or "more" depend on the conversation, and must reach the chat.
+    # Within a session, only follow-ups prefetched for the last exchange are served.
+    new_session = not history
+    response_cache = get_response_cache()
+    cache_scope = response_cache_scope(agent_manager, None if new_session else history[-1])
+    try:
+        # Short-circuit to a stored response for repeated, paraphrased or prefetched queries
+        cached_response = await response_cache.lookup(query, cache_scope)
+        if cached_response is not None:
+            logger.info("Returning cached response")
+            return cached_response, None, model_client, agent_manager
+        
+        # Reuse the cached chat, building the model client and agents only once
+        task = query
+        if chat is None:
+            chat, model_client, agent_manager = await get_chat()
             
             if not chat:
                 return "Error: No agents available. Check the logs for initialization errors.", None, None, None
             
-            print("Starting SelectorGroupChat to process the query...")
+            # The cached chat is shared across sessions; start this one from an empty
+            # transcript. reset() also resets the termination condition.
+            await chat.reset()
+            # Answers served from the cache never reached the chat, so replay the session so far
+            task = replay_task(query, history)
+            logger.info("Starting SelectorGroupChat to process the query...")
         else:
-            print("Continuing existing chat session...")
+            logger.info("Continuing existing chat session...")
+        
+        from autogen_agentchat.messages import TextMessage, ModelClientStreamingChunkEvent
+        message_formatters = _load_message_formatters()
         
-        # Run the chat to completion, collecting all messages
-        messages = []
-        async for message in chat.run_stream(task=query):
-            # Skip non-message objects
-            if hasattr(message, 'source') and hasattr(message, 'content'):
-                if isinstance(message, ToolCallRequestEvent): #NOTE: also can check with list
-                    if isinstance(message.content[0], FunctionCall):
-                        message_str = f"{message.source}: Function calling...\n {message.content[0]}"
-                elif isinstance(message, ToolCallExecutionEvent): #NOTE: also can check with list
-                    if isinstance(message.content[0], FunctionExecutionResult):
-                        message_str = f"{message.source}: Fetched function result..."
+        # Read the chat stream in its own task so slow output (e.g. stdout redirected to
+        # a pipe) never delays reading the next chunk from the model. The bounded queue
+        # applies backpressure if the output falls far behind.
+        message_queue: asyncio.Queue = asyncio.Queue(maxsize=STREAM_QUEUE_SIZE)
+        
+        async def produce():
+            try:
+                # Close the stream right away if cancelled, so the team does not stay marked as running
+                async with contextlib.aclosing(chat.run_stream(task=task)) as stream:
+                    async for message in stream:
+                        await message_queue.put(message)
+            finally:
+                if asyncio.current_task().cancelling():
+                    # The consumer has stopped reading, so the queue may never drain
+                    with contextlib.suppress(asyncio.QueueFull):
+                        message_queue.put_nowait(None)
                 else:
-                    if isinstance(message, ToolCallSummaryMessage):
-                        message_str = f"{message.source}: Summarizing tool call..."
-                    elif isinstance(message, TextMessage):
-                        message_str = f"{message.source}: {message.content}"
-                    
-                print(message_str)
-                messages.append(message_str)
+                    await message_queue.put(None)
+        
+        producer = asyncio.create_task(produce())
         
-        # Return the last message from a worker agent (not the planner) as the final answer
-        # Or return a formatted summary of all messages if no clear final answer
-        response = ""
-        if messages:
-            # Try to find the last non-planner message
-            for msg in reversed(messages):
-                if not msg.startswith("planner:"):
-                    response = msg.split(":", 1)[1].strip()
-                    break
+        # Run the chat to completion, keeping the displayed messages to pick the final answer from
+        shown_messages = []
+        streaming_source = None
+        try:
+            while (message := await message_queue.get()) is not None:
+                # Surface partial tokens immediately instead of waiting for the full message
+                if type(message) is ModelClientStreamingChunkEvent:
+                    if on_token:
+                        if streaming_source != message.source:
+                            if streaming_source is not None:
+                                await on_token("\n")
+                            await on_token(f"{message.source}: ")
+                            streaming_source = message.source
+                        await on_token(message.content)
+                    continue
+            
+                # Dispatch on the exact message type; other events are not displayed
+                handler = message_formatters.get(type(message))
+                if handler is None:
+                    continue
             
-            # If only planner messages, return the last one
-            if not response:
-                response = messages[-1].split(":", 1)[1].strip()
+                # The text of a streamed message has already been written by on_token
+                already_shown = False
+                if streaming_source is not None:
+                    await on_token("\n")
+                    already_shown = type(message) is TextMessage and message.source == streaming_source
+                    streaming_source = None
+            
+                # Format only the lines that are actually emitted
+                if not already_shown and logger.isEnabledFor(logging.INFO):
+                    logger.info("%s: %s", message.source, handler(message))
+                shown_messages.append(message)
+        finally:
+            # Stop reading the stream if output handling failed, and wait for it to close
+            if not producer.done():
+                producer.cancel()
+                await asyncio.gather(producer, return_exceptions=True)
+        
+        # Re-raise any error from the chat stream itself
+        await producer
+        
+        response = select_response(shown_messages)
+        if response is not None:
+            # Only cache responses from a completed run that did not depend on earlier turns
+            if new_session:
+                await response_cache.store(query, response, cache_scope)
         else:
             response = "No response generated by the agent team."
             
         return response, chat, model_client, agent_manager
             
     except Exception as e:
-        print(f"Error processing query: {e}")
-        traceback.print_exc()
+        logger.exception("Error processing query: %s", e)
         return f"Error processing your query: {str(e)}", None, None, None
+    finally:
+        # Drop the embedding kept from a missed lookup if the response was not stored
+        response_cache.discard(query, cache_scope)
+
+async def async_input(prompt: str = "") -> str:
+    """
+    Read a line from stdin without blocking the event loop.
+    
+    A daemon thread is used instead of the default executor so that a pending
+    read never keeps the process alive after the session ends.
+    """
+    loop = asyncio.get_running_loop()
+    future = loop.create_future()
+    
+    def deliver(setter, value):
+        if not future.done():
+            setter(value)
+    
+    def read():
+        try:
+            line = input(prompt)
+        except Exception as e:
+            loop.call_soon_threadsafe(deliver, future.set_exception, e)
+        else:
+            loop.call_soon_threadsafe(deliver, future.set_result, line)
+    
+    threading.Thread(target=read, daemon=True).start()
+    return await future
+
+async def prewarm():
+    """Initialize the model client, agents and MCP tools in the background"""
+    try:
+        await get_chat()
+    except Exception as e:
+        logger.exception("Error prewarming agents: %s", e)
+
+async def prefetch_followups(query: str, response: str):
+    """
+    Answer likely follow-up questions in the background and store them in the response cache.
+    
+    The answers are scoped to the (query, response) exchange, so process_query only serves
+    them for the message that directly follows it.
+    """
+    try:
+        _, _, agent_manager = await get_chat()
+        if agent_manager is None:
+            return
+        
+        followups = await agent_manager.suggest_followups(query, response)
+        response_cache = get_response_cache()
+        cache_scope = response_cache_scope(agent_manager, (query, response))
+        
+        # Run follow-ups one at a time to bound the extra cost
+        for followup in followups:
+            if await response_cache.lookup(followup, cache_scope) is not None:
+                continue
+            
+            try:
+                chat = await get_prefetch_chat()
+                if not chat:
+                    return
+                
+                # Each follow-up runs in a fresh session that replays the exchange it follows
+                await chat.reset()
+                # Close the stream right away if cancelled, so the prefetch chat can be reset again
+                async with contextlib.aclosing(chat.run_stream(task=replay_task(followup, [(query, response)]))) as stream:
+                    messages = [message async for message in stream]
+                answer = select_response(messages)
+                if answer is not None:
+                    await response_cache.store(followup, answer, cache_scope)
+            finally:
+                response_cache.discard(followup, cache_scope)
+    except Exception as e:
+        logger.exception("Error prefetching follow-up queries: %s", e)
+
+async def cancel_prefetch(prefetch_task: Optional[asyncio.Task]):
+    """Cancel a running prefetch and wait for it to stop"""
+    if prefetch_task and not prefetch_task.done():
+        prefetch_task.cancel()
+        await asyncio.gather(prefetch_task, return_exceptions=True)
 
 async def interactive_chat():
     """Run an interactive chat session with the agent team"""
@@ -179,12 +553,17 @@ async def interactive_chat():
     chat = None
     model_client = None
     agent_manager = None
-    conversation_history = []
+    # (query, response) exchanges of this session, replayed when the chat starts over
+    conversation_history: List[tuple] = []
+    
+    # Start MCP servers and agents while the user composes the first message
+    prewarm_task = asyncio.create_task(prewarm())
+    prefetch_task = None
     
     while True:
         try:
             # Get user input
-            user_input = input("\n👤 You: ")
+            user_input = await async_input("\n👤 You: ")
             
             # Check if user wants to exit
             if user_input.lower() in ['exit', 'quit', 'bye']:
@@ -202,57 +581,81 @@ async def interactive_chat():
             
             # Handle config command to view or update agent configuration
             if user_input.lower() == 'config':
+                # Let background initialization finish first, or it could store a chat
+                # built with the old configuration after the one below is invalidated
+                await prewarm_task
+                agent_manager = agent_manager or _agent_cache.get("agent_manager")
                 if agent_manager:
                     print(f"\nCurrent agent configuration: {agent_manager.agent_config}")
-                    update = input("Would you like to update the configuration? (y/n): ")
+                    update = await async_input("Would you like to update the configuration? (y/n): ")
                     if update.lower() == 'y':
+                        # Follow-ups prefetched for the old agents would never be served
+                        await cancel_prefetch(prefetch_task)
                         for agent_type in agent_manager.agent_config:
-                            enabled = input(f"Enable {agent_type}? (y/n): ")
+                            enabled = await async_input(f"Enable {agent_type}? (y/n): ")
                             agent_manager.agent_config[agent_type] = enabled.lower() == 'y'
                         
                         print(f"Updated configuration: {agent_manager.agent_config}")
                         # Recreate chat with new configuration
+                        invalidate_chat()
                         chat = None
                 else:
                     print("\nAgent manager not initialized yet. Start a conversation first.")
                 continue
                 
-            # Store user input in history
-            conversation_history.append(f"User: {user_input}")
+            # Prefetched answers only follow the last exchange, so unfinished ones are no longer useful
+            await cancel_prefetch(prefetch_task)
             
             # Process the query
             print("\n⏳ Processing...")
-            response, chat, model_client, agent_manager = await process_query(user_input, chat, model_client, agent_manager)
+            response, chat, model_client, agent_manager = await process_query(
+                user_input, chat, model_client, agent_manager, on_token=write_token,
+                history=conversation_history,
+            )
             
             # Display response
             print("\n🤖 Agent: " + response)
             
-            # Store agent response in history
-            conversation_history.append(f"Agent: {response}")
+            # Store the exchange in history
+            conversation_history.append((user_input, response))
+            
+            # Use the idle time while the user types to prefetch likely follow-ups
+            if PREFETCH_FOLLOWUPS and chat:
+                prefetch_task = asyncio.create_task(prefetch_followups(user_input, response))
             
         except KeyboardInterrupt:
             print("\n\nChat session interrupted. Exiting...")
             break
         except Exception as e:
             print(f"\n⚠️ Error: {str(e)}")
-            traceback.print_exc()
+            logger.exception("Unhandled error in interactive chat")
+    
+    for task in (prewarm_task, prefetch_task):
+        if task and not task.done():
+            task.cancel()
 
 async def main():
     """Main function to either process a single query or start interactive chat"""
-    # Check if command line arguments are provided
-    if len(sys.argv) > 1:
-        # If arguments are provided, process a single query
-        query = " ".join(sys.argv[1:])
-        print(f"Processing query: {query}")
-        
-        response, _, _, _ = await process_query(query)
-        
-        print("\n=== Response ===\n")
-        print(response)
-        print("\nFor interactive mode, run without arguments: python autogen_agent.py")
-    else:
-        # No arguments - run interactive mode
-        await interactive_chat()
+    try:
+        # Check if command line arguments are provided
+        if len(sys.argv) > 1:
+            # If arguments are provided, process a single query
+            query = " ".join(sys.argv[1:])
+            print(f"Processing query: {query}")
+            
+            response, _, _, _ = await process_query(query, on_token=write_token)
+            
+            print("\n=== Response ===\n")
+            print(response)
+            print("\nFor interactive mode, run without arguments: python autogen_agent.py")
+        else:
+            # No arguments - run interactive mode
+            await interactive_chat()
+    finally:
+        await close_chat()
 
 if __name__ == "__main__":
-    asyncio.run(main()) 
+    from mcp_agents.logging_utils import create_runner, setup_logging
+    setup_logging(os.getenv("LOG_LEVEL", "INFO"))
+    with create_runner() as runner:
+        runner.run(main()) 
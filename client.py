@@ -1,26 +1,109 @@
+import argparse
 import asyncio
+import contextlib
+import functools
+import hashlib
+import importlib.util
+import logging
+import sqlite3
 import sys
 import os
+import time
+import httpx
 from dotenv import load_dotenv
 from openai import AsyncAzureOpenAI
+from openai.types.chat import ChatCompletion
 from mcp import ClientSession, StdioServerParameters
 from mcp.client.stdio import stdio_client
 import json
-from typing import Any, Dict, List, Literal, Optional
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Literal, Optional
+from urllib.parse import quote, urlsplit
+
+from mcp_agents.logging_utils import create_runner, setup_logging
+
+# orjson parses tool-call arguments and encodes cache keys several times faster when it is installed
+try:
+    import orjson
+    _json_loads = orjson.loads
+    
+    def _canonical_json(value: Any) -> bytes:
+        return orjson.dumps(value, option=orjson.OPT_SORT_KEYS)
+except ImportError:
+    _json_loads = json.loads
+    
+    def _canonical_json(value: Any) -> bytes:
+        return json.dumps(value, sort_keys=True, separators=(",", ":")).encode("utf-8")
+
+logger = logging.getLogger(__name__)
+
+# Argument strings the model sends for tools without parameters. The shared dict
+# is only read by the MCP session when it builds the request.
+_EMPTY_ARGS_JSON = frozenset(("", "{}"))
+_EMPTY_ARGS: Dict[str, Any] = {}
+
+# Parameters schema for tools that declare none; only serialized, never modified
+_EMPTY_SCHEMA: Dict[str, Any] = {}
+
+
+def _extract_text(result) -> str:
+    """
+    Get the text of a tool result.
+    
+    Args:
+        result: Result returned by the MCP session
+    
+    Returns:
+        The text parts of the result joined by newlines; a result without text
+        (e.g. a single image) falls back to its repr
+    """
+    content = getattr(result, "content", None)
+    if not content:
+        return str(result)
+    text = "\n".join(part.text for part in content if part.type == "text")
+    return text or str(content[0])
 
 load_dotenv()
 
+# Chat completion responses are cached on disk so replayed prompts skip the model call
+LLM_CACHE_PATH = os.getenv("LLM_CACHE_PATH", ".llm_cache.sqlite3")
+LLM_CACHE_TTL = float(os.getenv("LLM_CACHE_TTL", "86400"))
+
+# Schema exploration of each database is recorded and replayed into later questions
+SCHEMA_HISTORY_PATH = os.getenv("SCHEMA_HISTORY_PATH", ".schema_history.json")
+SCHEMA_HISTORY_TTL = float(os.getenv("SCHEMA_HISTORY_TTL", "86400"))
+
+# Maximum number of conversations sent to Azure OpenAI at once in batch mode
+MAX_CONCURRENCY = int(os.getenv("AZURE_OPENAI_MAX_CONCURRENCY", "20"))
+
 class MCPClient:
     """
     A client class for interacting with the MCP (Model Control Protocol) server.
     This class manages the connection and communication with the MCP server.
     """
 
-    def __init__(self, server_params: StdioServerParameters):
-        """Initialize the MCP client with server parameters"""
+    def __init__(self, server_params: StdioServerParameters, max_concurrent_calls: int = 4,
+                 cacheable_tools: Iterable[str] = ()):
+        """
+        Initialize the MCP client with server parameters.
+        
+        Args:
+            server_params: Parameters used to launch the MCP server
+            max_concurrent_calls: Maximum number of tool calls in flight on the server's stdio pipe
+            cacheable_tools: Names of side-effect-free tools whose results are reused for
+                identical arguments within a session
+        """
         self.server_params = server_params
         self.session = None
-        self._client = None
+        # Holds the stdio transport and the session so they are closed in reverse order
+        self._exit_stack: Optional[contextlib.AsyncExitStack] = None
+        # The server reads requests from a single pipe, so bursts of calls are queued here
+        self._call_semaphore = asyncio.Semaphore(max_concurrent_calls)
+        # Tool listings are fixed for the lifetime of a session
+        self._tools_cache: Optional[List[Any]] = None
+        self._openai_tools_cache: Optional[List[Dict]] = None
+        # Results (or pending calls) of cacheable tools, keyed by tool name and canonical arguments
+        self.cacheable_tools = frozenset(cacheable_tools)
+        self._tool_results: Dict[tuple, asyncio.Future] = {}
     
     async def __aenter__(self):
         """Async context manager entry"""
@@ -29,18 +112,37 @@ class MCPClient:
     
     async def __aexit__(self, exc_type, exc_val, exc_tb):
         """Async context manager exit"""
-        if self.session:
-            await self.session.__aexit__(exc_type, exc_val, exc_tb)
-        if self._client:
-            await self._client.__aexit__(exc_type, exc_val, exc_tb)
+        self.invalidate_tools()
+        self.clear_tool_cache()
+        if self._exit_stack is not None:
+            exit_stack, self._exit_stack = self._exit_stack, None
+            self.session = None
+            await exit_stack.__aexit__(exc_type, exc_val, exc_tb)
     
     async def connect(self):
         """Establishes connection to MCP server"""
-        self._client = stdio_client(self.server_params)
-        self.read, self.write = await self._client.__aenter__()
-        session = ClientSession(self.read, self.write)
-        self.session = await session.__aenter__()
-        await self.session.initialize()
+        # A new session may expose a different tool list
+        self.invalidate_tools()
+        async with contextlib.AsyncExitStack() as exit_stack:
+            self.read, self.write = await exit_stack.enter_async_context(stdio_client(self.server_params))
+            self.session = await exit_stack.enter_async_context(ClientSession(self.read, self.write))
+            await self.session.initialize()
+            
+            # Fetch the tools now so the first agent turn does not wait on list_tools
+            await self.get_openai_tools()
+            
+            # Connected: keep both contexts open until __aexit__. If anything above
+            # raised, the with block has already closed whatever was opened.
+            self._exit_stack = exit_stack.pop_all()
+    
+    def invalidate_tools(self):
+        """Forget the cached tool lists, e.g. when the server reports that its tools changed"""
+        self._tools_cache = None
+        self._openai_tools_cache = None
+    
+    def clear_tool_cache(self):
+        """Forget the cached tool results, e.g. after data behind a cacheable tool changed"""
+        self._tool_results.clear()
     
     async def get_available_tools(self) -> List[Any]:
         """
@@ -49,30 +151,33 @@ class MCPClient:
         if not self.session:
             raise RuntimeError("Not connected to MCP server")
         
-        tool_defs = await self.session.list_tools()
-        return tool_defs.tools
+        if self._tools_cache is None:
+            tool_defs = await self.session.list_tools()
+            self._tools_cache = tool_defs.tools
+        return self._tools_cache
     
     async def get_openai_tools(self) -> List[Dict]:
         """
         Convert MCP tools to the format required by OpenAI API.
         """
+        if self._openai_tools_cache is not None:
+            return self._openai_tools_cache
+        
         mcp_tools = await self.get_available_tools()
         
-        tools = []
-        for t in mcp_tools:
-            name = t.name
-            desc = t.description or "No description"
-            params = t.inputSchema or {}
-            
-            tools.append({
+        tools = [
+            {
                 "type": "function",
                 "function": {
-                    "name": name,
-                    "description": desc,
-                    "parameters": params
+                    "name": t.name,
+                    "description": t.description or "No description",
+                    "parameters": t.inputSchema or _EMPTY_SCHEMA
                 }
-            })
+            }
+            for t in mcp_tools
+        ]
         
+        self._openai_tools_cache = tools
         return tools
     
     async def call_tool(self, tool_name: str, arguments: Dict) -> Any:
@@ -89,8 +194,109 @@ class MCPClient:
         if not self.session:
             raise RuntimeError("Not connected to MCP server")
         
-        result = await self.session.call_tool(tool_name, arguments)
-        return result
+        if tool_name not in self.cacheable_tools:
+            return await self._call_tool(tool_name, arguments)
+        
+        # Identical calls share one result, including calls still in flight
+        key = (tool_name, _canonical_json(arguments))
+        future = self._tool_results.get(key)
+        if future is None:
+            future = self._tool_results[key] = asyncio.ensure_future(self._call_tool(tool_name, arguments))
+            
+            def forget_failure(done: asyncio.Future):
+                # Failed calls are retried next time instead of replaying the error
+                if done.cancelled() or done.exception() is not None or getattr(done.result(), "isError", False):
+                    self._tool_results.pop(key, None)
+            
+            future.add_done_callback(forget_failure)
+        
+        # Shielded so one cancelled caller does not cancel the call for the others
+        return await asyncio.shield(future)
+    
+    async def _call_tool(self, tool_name: str, arguments: Dict) -> Any:
+        async with self._call_semaphore:
+            return await self.session.call_tool(tool_name, arguments)
+
+
+class RequestKey:
+    """
+    Incremental cache key for the model turns of one agent run.
+    
+    The model, tools and tool_choice are serialized once per run, and each
+    message only when it is first seen. Messages are only appended, and later
+    pruning of old tool results depends only on those messages, so the key
+    still identifies the request exactly.
+    """
+    
+    def __init__(self, model: str, tools: List[Dict], tool_choice: str):
+        """Start the key from the fields that stay the same for every turn"""
+        self._hash = hashlib.sha256(_canonical_json({"model": model, "t": tools, "tc": tool_choice}))
+        self._hashed_messages = 0
+    
+    def for_messages(self, messages: List[Dict]) -> str:
+        """Return the key for a request with the given messages"""
+        for message in messages[self._hashed_messages:]:
+            self._hash.update(b"\n")
+            self._hash.update(_canonical_json(message))
+        self._hashed_messages = len(messages)
+        # hexdigest() leaves the running hash usable for later turns
+        return self._hash.hexdigest()
+
+
+class LLMCache:
+    """
+    Cache of chat completion responses keyed on the exact request.
+    
+    Responses are stored in a SQLite file so identical requests are answered
+    without an Azure OpenAI round trip, also across runs.
+    """
+    
+    def __init__(self, path: str = LLM_CACHE_PATH, ttl: float = LLM_CACHE_TTL):
+        """
+        Initialize the cache.
+        
+        Args:
+            path: SQLite file holding the cached responses
+            ttl: Seconds after which a cached response is fetched again
+        """
+        self.ttl = ttl
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS responses (key TEXT PRIMARY KEY, created REAL, response TEXT)"
+        )
+        self._conn.commit()
+    
+    def _get(self, key: str) -> Optional[str]:
+        row = self._conn.execute(
+            "SELECT response FROM responses WHERE key = ? AND created >= ?", (key, time.time() - self.ttl)
+        ).fetchone()
+        return row[0] if row else None
+    
+    def _set(self, key: str, response_json: str):
+        self._conn.execute(
+            "INSERT OR REPLACE INTO responses (key, created, response) VALUES (?, ?, ?)",
+            (key, time.time(), response_json)
+        )
+        self._conn.commit()
+    
+    async def get_or_set(self, key: str, fetch: Callable[[], Awaitable[ChatCompletion]]) -> ChatCompletion:
+        """
+        Return the cached response for the key, or fetch and store it.
+        
+        Args:
+            key: Cache key from RequestKey.for_messages
+            fetch: Function returning the awaitable that produces the response on a miss
+            
+        Returns:
+            The chat completion response
+        """
+        cached = await asyncio.to_thread(self._get, key)
+        if cached is not None:
+            return ChatCompletion.model_validate_json(cached)
+        
+        response = await fetch()
+        await asyncio.to_thread(self._set, key, response.model_dump_json())
+        return response
 
 
 class BaseAgent:
@@ -98,11 +304,27 @@ class BaseAgent:
     Base agent class that handles common tool calling patterns for all agents.
     """
     
-    def __init__(self, client: AsyncAzureOpenAI, deployment_name: str, mcp_client: MCPClient):
-        """Initialize the agent with OpenAI client and MCP client"""
+    # Stop after this many tool-calling turns instead of looping indefinitely
+    max_tool_iterations = 15
+    # Number of most recent tool-calling turns whose results are sent in full;
+    # results of older turns are replaced by a stub
+    tool_result_window = 4
+    # Longest tool result passed to the model; the rest is cut off with a marker
+    max_tool_result_chars = 8192
+    
+    def __init__(self, client: AsyncAzureOpenAI, deployment_name: str, mcp_client: MCPClient,
+                 cache: Optional[LLMCache] = None, stream_output: bool = False):
+        """
+        Initialize the agent with OpenAI client, MCP client and an optional response cache.
+        
+        Args:
+            stream_output: Print response text as it arrives instead of once the turn is complete
+        """
         self.client = client
         self.deployment_name = deployment_name
         self.mcp_client = mcp_client
+        self.cache = cache
+        self.stream_output = stream_output
     
     async def _get_tools(self):
         """Get available tools from MCP client"""
@@ -121,51 +343,94 @@ class BaseAgent:
         """Get the header string for output"""
         return "Output"
     
-    async def _process_tool_calls(self, calls, messages, debug=False):
-        """Process tool calls and add results to messages"""
-        for call_info in calls:
+    async def _execute_tool_call(self, fn_name, fn_args_json, parsed_args):
+        """
+        Execute a single tool call and return its result text.
+        
+        Args:
+            fn_name: Name of the tool to call
+            fn_args_json: Arguments as the JSON string emitted by the model
+            parsed_args: Arguments already parsed in this turn, keyed by JSON string
+        """
+        # Zero-argument tools need no parse; identical calls in one turn share a single parse
+        if fn_args_json in _EMPTY_ARGS_JSON:
+            fn_args = _EMPTY_ARGS
+        else:
+            fn_args = parsed_args.get(fn_args_json)
+            if fn_args is None:
+                fn_args = parsed_args[fn_args_json] = _json_loads(fn_args_json)
+        
+        logger.debug("Calling tool %s with arguments %s", fn_name, fn_args)
+        
+        result = await self.mcp_client.call_tool(fn_name, fn_args)
+        
+        result_text = _extract_text(result)
+        
+        # Large results (e.g. PostgreSQL rowsets) would be re-sent on every later turn
+        if len(result_text) > self.max_tool_result_chars:
+            omitted = len(result_text) - self.max_tool_result_chars
+            result_text = result_text[:self.max_tool_result_chars] + f"\n... [truncated {omitted} chars]"
+        
+        if len(result_text) < 1000:
+            logger.debug("Result of %s: %s", fn_name, result_text)
+        else:
+            logger.debug("Result of %s: (too long to display, length: %d)", fn_name, len(result_text))
+        
+        return result_text
+    
+    async def _process_tool_calls(self, calls, messages, parsed_args=None, started=None):
+        """
+        Process tool calls concurrently and add results to messages in call order.
+        
+        Args:
+            calls: Tool calls from the model's turn
+            messages: Conversation messages to append to
+            parsed_args: Arguments already parsed in this turn, keyed by JSON string
+            started: Tasks already running for some calls, keyed by call id
+        """
+        if parsed_args is None:
+            parsed_args = {}
+        if started is None:
+            started = {}
+        
+        # The calls of one model turn are independent, so run them all at once
+        results = await asyncio.gather(
+            *(
+                started.pop(call_info.id, None)
+                or self._execute_tool_call(call_info.function.name, call_info.function.arguments, parsed_args)
+                for call_info in calls
+            ),
+            return_exceptions=True
+        )
+        
+        # One assistant message carries the whole tool_calls array, as the model emitted it
+        messages.append({
+            "role": "assistant",
+            "tool_calls": [
+                {
+                    "id": call_info.id,
+                    "type": "function",
+                    "function": {
+                        "name": call_info.function.name,
+                        "arguments": call_info.function.arguments
+                    }
+                }
+                for call_info in calls
+            ]
+        })
+        
+        # Followed by one tool response per call id, in the same order
+        for call_info, result in zip(calls, results):
             fn_name = call_info.function.name
-            fn_args_json = call_info.function.arguments
-            fn_args = json.loads(fn_args_json)
             
-            if debug:
-                print(f"\n[DEBUG] Calling tool: {fn_name}")
-                print(f"[DEBUG] Arguments: {json.dumps(fn_args, indent=2)}")
-            
-            # Execute the tool call
-            try:
-                result = await self.mcp_client.call_tool(fn_name, fn_args)
-                
-                # Extract the result text
-                result_text = result.content[0].text if hasattr(result, 'content') else str(result)
-                
-                if debug and len(result_text) < 1000:
-                    print(f"[DEBUG] Result: {result_text}")
-                elif debug:
-                    print(f"[DEBUG] Result: (too long to display, length: {len(result_text)})")
-                
-            except Exception as e:
-                error_message = str(e)
+            # A failed call is reported back to the model instead of aborting the batch
+            if isinstance(result, Exception):
+                error_message = str(result)
                 result_text = f"Error executing {fn_name}: {error_message}"
-                if debug:
-                    print(f"[DEBUG] Error: {error_message}")
+                logger.debug("Error executing %s: %s", fn_name, error_message)
+            else:
+                result_text = result
             
-            # Add the assistant message with tool call
-            messages.append({
-                "role": "assistant",
-                "tool_calls": [
-                    {
-                        "id": call_info.id,
-                        "type": "function",
-                        "function": {
-                            "name": fn_name,
-                            "arguments": fn_args_json
-                        }
-                    }
-                ]
-            })
-            
-            # Add the tool response
             messages.append({
                 "role": "tool",
                 "tool_call_id": call_info.id,
@@ -179,51 +444,222 @@ class BaseAgent:
         """Determine if intermediate content should be added to messages"""
         return False
     
-    async def run_agent_loop(self, prompt, debug=False):
-        """Main agent loop handling tool calls"""
+    def _after_tool_calls(self, calls, messages):
+        """Hook called after the results of a tool-calling turn were added to messages"""
+        pass
+    
+    def _prune_tool_results(self, messages):
+        """Replace tool results of turns outside the recent window with a one-line stub"""
+        turn_starts = [
+            i for i, message in enumerate(messages)
+            if message["role"] == "assistant" and message.get("tool_calls")
+        ]
+        # The latest turn is always kept whole, as the model has not seen its results yet
+        kept_turns = max(1, self.tool_result_window)
+        if len(turn_starts) <= kept_turns:
+            return
+        
+        for i in range(turn_starts[-kept_turns]):
+            message = messages[i]
+            if message["role"] == "tool" and not message["content"].startswith("[pruned: "):
+                # Replace rather than mutate, so recorded copies of the history keep the full text
+                messages[i] = {**message, "content": f"[pruned: {len(message['content'])} chars from {message['name']}]"}
+    
+    async def _stream_completion(self, messages, tools, parsed_args, started, on_content=None) -> ChatCompletion:
+        """
+        Stream the next model turn and rebuild it as a ChatCompletion.
+        
+        Tool calls are streamed one after another, so once the model moves on to
+        the next call the previous one is complete. Each complete call is started
+        right away, overlapping tool execution with the rest of the generation.
+        
+        Args:
+            messages: Conversation messages
+            tools: Tools in OpenAI format
+            parsed_args: Arguments already parsed in this turn, keyed by JSON string
+            started: Receives the task started for each call, keyed by call id
+            on_content: Called with each piece of response text as it arrives
+        """
+        stream = await self.client.chat.completions.create(
+            model=self.deployment_name,
+            messages=messages,
+            tools=tools,
+            tool_choice="auto",
+            stream=True
+        )
+        
+        completion_id, created, model = "", 0, self.deployment_name
+        content_parts = []
+        calls: Dict[int, Dict] = {}
+        finish_reason = None
+        
+        def start(index):
+            call = calls[index]
+            started[call["id"]] = asyncio.create_task(
+                self._execute_tool_call(call["function"]["name"], call["function"]["arguments"], parsed_args)
+            )
+        
+        try:
+            async for chunk in stream:
+                completion_id, created, model = chunk.id, chunk.created, chunk.model
+                # Azure sends content filter results in chunks without choices
+                if not chunk.choices:
+                    continue
+                
+                choice = chunk.choices[0]
+                delta = choice.delta
+                if delta.content:
+                    content_parts.append(delta.content)
+                    if on_content is not None:
+                        on_content(delta.content)
+                
+                for tool_call in delta.tool_calls or ():
+                    call = calls.get(tool_call.index)
+                    if call is None:
+                        if calls:
+                            start(max(calls))
+                        call = calls[tool_call.index] = {
+                            "id": tool_call.id,
+                            "type": "function",
+                            "function": {"name": "", "arguments": ""}
+                        }
+                    if tool_call.id:
+                        call["id"] = tool_call.id
+                    if tool_call.function:
+                        call["function"]["name"] += tool_call.function.name or ""
+                        call["function"]["arguments"] += tool_call.function.arguments or ""
+                
+                if choice.finish_reason:
+                    finish_reason = choice.finish_reason
+        except BaseException:
+            for task in started.values():
+                task.cancel()
+            raise
+        
+        return ChatCompletion.model_validate({
+            "id": completion_id,
+            "object": "chat.completion",
+            "created": created,
+            "model": model,
+            "choices": [{
+                "index": 0,
+                "finish_reason": finish_reason or "stop",
+                "message": {
+                    "role": "assistant",
+                    "content": "".join(content_parts) or None,
+                    "tool_calls": [calls[index] for index in sorted(calls)] or None
+                }
+            }]
+        })
+    
+    async def _create_completion(self, messages, tools, request_key: Optional[RequestKey] = None,
+                                 parsed_args=None, started=None, on_content=None):
+        """Request the next model turn, answering from the cache when possible"""
+        def fetch():
+            return self._stream_completion(
+                messages, tools,
+                {} if parsed_args is None else parsed_args,
+                {} if started is None else started,
+                on_content
+            )
+        
+        if self.cache is None or request_key is None:
+            return await fetch()
+        
+        return await self.cache.get_or_set(request_key.for_messages(messages), fetch)
+    
+    async def run_agent_loop(self, prompt, print_output: bool = True):
+        """
+        Main agent loop handling tool calls.
+        
+        Args:
+            prompt: Input for the first model turn
+            print_output: Print the final response; pass False to only return it
+        
+        Returns:
+            The final response text, or None if the tool-calling turn limit was reached
+        """
         tools = await self._get_tools()
         
-        # Display available tools if in debug mode
-        if debug:
-            print(f"\n=== Available {self._get_output_header()} Tools ===")
+        # List the available tools when debug logging is enabled
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Available %s tools:", self._get_output_header())
             for tool in tools:
-                print(f"- {tool['function']['name']}: {tool['function']['description']}")
-            print("\n")
+                logger.debug("- %s: %s", tool['function']['name'], tool['function']['description'])
         
         # Start with initial messages
         messages = self._get_initial_messages(prompt)
         
+        # The tools are the same on every turn, so they are serialized for the cache key once
+        request_key = RequestKey(self.deployment_name, tools, "auto") if self.cache else None
+        
+        # Printed text is tracked per run, as one agent may serve several runs at once
+        header_printed = False
+        turn_printed = False
+        
+        def print_content(text):
+            nonlocal header_printed, turn_printed
+            if not header_printed:
+                print(f"\n=== {self._get_output_header()} ===\n")
+                header_printed = True
+            turn_printed = True
+            print(text, end="", flush=True)
+        
+        tool_turns = 0
         while True:
-            response = await self.client.chat.completions.create(
-                model=self.deployment_name,
-                messages=messages,
-                tools=tools,
-                tool_choice="auto"
+            # Per-turn state shared by calls started while streaming and the rest of the batch
+            parsed_args: Dict[str, Any] = {}
+            started: Dict[str, asyncio.Task] = {}
+            turn_printed = False
+            response = await self._create_completion(
+                messages, tools, request_key, parsed_args, started,
+                print_content if print_output and self.stream_output else None
             )
             
             choice = response.choices[0]
             msg = choice.message
             
+            # End the line of text streamed in this turn
+            if turn_printed:
+                print()
+            
             # If the model wants to use tools
             if choice.finish_reason == "tool_calls":
                 calls = msg.tool_calls
                 if not calls:
-                    print("No calls found, but finish_reason=tool_calls. Exiting.")
+                    logger.warning("No calls found, but finish_reason=tool_calls. Exiting.")
                     break
                 
                 # Process each tool call
-                messages = await self._process_tool_calls(calls, messages, debug)
+                messages = await self._process_tool_calls(calls, messages, parsed_args, started)
                 
                 # Add the model's message to conversation if needed
                 if msg.content and self._should_add_intermediate_content(msg):
                     messages.append({"role": "assistant", "content": msg.content})
                 
+                self._after_tool_calls(calls, messages)
+                self._prune_tool_results(messages)
+                
+                tool_turns += 1
+                if tool_turns >= self.max_tool_iterations:
+                    logger.warning("Stopping after %d tool-calling turns without a final answer", tool_turns)
+                    return None
+                
                 # Loop back for another LLM call
                 continue
             
+            # Calls started before the turn was cut short are not used
+            for task in started.values():
+                task.cancel()
+            
             # If we have a final response, process it and exit
-            self._process_final_response(msg)
-            break
+            if print_output and not turn_printed:
+                if header_printed:
+                    # Earlier turns already printed the header
+                    print(msg.content)
+                else:
+                    self._process_final_response(msg)
+            return msg.content
 
 
 class DialogueAgent(BaseAgent):
@@ -247,24 +683,136 @@ class DialogueAgent(BaseAgent):
         """Get the header string for output"""
         return "Dialogue Output"
     
-    async def run(self, name: str):
+    async def run(self, name: str, print_output: bool = True):
         """Run the dialogue agent with the given name."""
-        await self.run_agent_loop(name)
+        return await self.run_agent_loop(name, print_output)
+    
+    async def run_many(self, names: List[str], max_concurrency: int = MAX_CONCURRENCY) -> List[Any]:
+        """
+        Run independent dialogues concurrently.
+        
+        Args:
+            names: Names to create a dialogue with Mary for
+            max_concurrency: Maximum number of conversations talking to Azure OpenAI at once
+            
+        Returns:
+            The final output for each name in order (None if the conversation hit the
+            tool-calling turn limit), or the exception that conversation raised.
+            Nothing is printed, since concurrent conversations finish in any order.
+        """
+        semaphore = asyncio.Semaphore(max_concurrency)
+        
+        async def run_one(name):
+            async with semaphore:
+                return await self.run(name, print_output=False)
+        
+        return await asyncio.gather(*(run_one(name) for name in names), return_exceptions=True)
+
+
+# Fixed start of every PostgreSQL question
+_PG_PREFIX = (
+    "Please help me interact with this PostgreSQL database. "
+    "First, explore the available tables and their schema to understand the database structure. "
+    "Then, answer this query: "
+)
+
+# SQL touching these catalogs explores the schema rather than answering the question
+_SCHEMA_CATALOGS = ("information_schema", "pg_catalog")
+
+# Recorded schema-exploration messages per database fingerprint, loaded on first use
+_schema_history: Optional[Dict[str, Dict]] = None
+
+
+def _load_schema_history() -> Dict[str, Dict]:
+    """Return the recorded schema explorations, reading the history file on first use"""
+    global _schema_history
+    if _schema_history is None:
+        try:
+            with open(SCHEMA_HISTORY_PATH, encoding="utf-8") as f:
+                _schema_history = json.load(f)
+        except FileNotFoundError:
+            _schema_history = {}
+        except Exception as e:
+            logger.warning("Error loading schema history from %s: %s", SCHEMA_HISTORY_PATH, e)
+            _schema_history = {}
+    return _schema_history
+
+
+def _save_schema_history():
+    """Persist the recorded schema explorations"""
+    try:
+        with open(SCHEMA_HISTORY_PATH, "w", encoding="utf-8") as f:
+            json.dump(_schema_history, f)
+    except Exception as e:
+        logger.warning("Error saving schema history to %s: %s", SCHEMA_HISTORY_PATH, e)
 
 
 class PostgreSQLAgent(BaseAgent):
     """
     An agent that interacts with PostgreSQL databases using LLMs and MCP tools.
+    
+    The first question for a database records the model's schema exploration
+    (the leading tool calls that only query the system catalogs). Later questions
+    start from that recorded history, skipping those model turns and queries.
     """
     
+    def __init__(self, client: AsyncAzureOpenAI, deployment_name: str, mcp_client: MCPClient,
+                 cache: Optional[LLMCache] = None, refresh_schema: bool = False,
+                 stream_output: bool = False):
+        """Initialize the agent; refresh_schema ignores any recorded schema exploration"""
+        super().__init__(client, deployment_name, mcp_client, cache, stream_output)
+        self.refresh_schema = refresh_schema
+        
+        # Identify the database without including the password
+        dsn = urlsplit(mcp_client.server_params.args[-1])
+        self._db_fingerprint = hashlib.sha256(
+            f"{dsn.hostname}:{dsn.port}{dsn.path}:{dsn.username}".encode("utf-8")
+        ).hexdigest()
+        
+        # Exploration messages recorded so far in this run, while recording
+        self._recording = False
+        self._schema_prefix: List[Dict] = []
+    
     def _get_initial_messages(self, prompt: str):
         """Create initial messages for PostgreSQL agent"""
-        guided_prompt = (
-            "Please help me interact with this PostgreSQL database. "
-            "First, explore the available tables and their schema to understand the database structure. "
-            "Then, answer this query: " + prompt
-        )
-        return [{"role": "user", "content": guided_prompt}]
+        messages = [{"role": "user", "content": _PG_PREFIX + prompt}]
+        
+        entry = _load_schema_history().get(self._db_fingerprint)
+        if (
+            entry is not None
+            and not self.refresh_schema
+            and time.time() - entry["created"] < SCHEMA_HISTORY_TTL
+        ):
+            logger.info("Reusing recorded schema exploration (%d messages)", len(entry["messages"]))
+            messages.extend(entry["messages"])
+            self._recording = False
+        else:
+            # Record this run's exploration
+            self._recording = True
+            self._schema_prefix = []
+        return messages
+    
+    def _after_tool_calls(self, calls, messages):
+        """Extend the recorded exploration while the model only queries the system catalogs"""
+        if not self._recording:
+            return
+        
+        if all(any(catalog in call.function.arguments for catalog in _SCHEMA_CATALOGS) for call in calls):
+            # The whole turn, including its intermediate content, belongs to the exploration.
+            # Take its messages now, before older tool results are pruned.
+            self._schema_prefix.extend(messages[1 + len(self._schema_prefix):])
+        else:
+            self._save_schema_prefix()
+    
+    def _save_schema_prefix(self):
+        """Store the recorded exploration for later questions and stop recording"""
+        self._recording = False
+        if not self._schema_prefix:
+            return
+        
+        history = _load_schema_history()
+        history[self._db_fingerprint] = {"created": time.time(), "messages": self._schema_prefix}
+        _save_schema_history()
     
     def _get_output_header(self):
         """Get the header string for output"""
@@ -274,9 +822,58 @@ class PostgreSQLAgent(BaseAgent):
         """PostgreSQL agent should add intermediate content if it exists"""
         return bool(msg.content)
     
-    async def run(self, prompt: str, debug: bool = False):
+    async def run(self, prompt: str):
         """Run the PostgreSQL agent with the given prompt."""
-        await self.run_agent_loop(prompt, debug)
+        await self.run_agent_loop(prompt)
+        
+        # The model may have answered right after exploring the schema
+        if self._recording:
+            self._save_schema_prefix()
+
+
+# Environment variables that must be set to connect to PostgreSQL
+_PG_REQUIRED = ("POSTGRES_USER", "POSTGRES_PASSWORD", "POSTGRES_HOST", "POSTGRES_DB")
+
+# Tools without side effects, whose results can be reused for identical arguments.
+# server-postgres runs every query in a read-only transaction.
+_CACHEABLE_TOOLS = {
+    "dialogue": ("yell", "sarcasm", "emotional"),
+    "postgres": ("query",),
+}
+
+# The dialogue server takes no settings
+_DIALOGUE_SERVER_PARAMS = StdioServerParameters(
+    command="python",
+    args=["dialogue_server.py"]
+)
+
+
+def _postgres_server_params(db_connection_string: str) -> StdioServerParameters:
+    return StdioServerParameters(
+        command="npx",
+        args=[
+            "-y",
+            "@modelcontextprotocol/server-postgres",
+            db_connection_string
+        ]
+    )
+
+
+@functools.lru_cache(maxsize=1)
+def _postgres_env_server_params() -> StdioServerParameters:
+    """Build the PostgreSQL server parameters from environment variables, once per process"""
+    missing_vars = [name for name in _PG_REQUIRED if not os.getenv(name)]
+    if missing_vars:
+        raise ValueError(f"Missing required environment variables: {', '.join(missing_vars)}")
+    
+    pg_user, pg_password, pg_host, pg_db = (os.environ[name] for name in _PG_REQUIRED)
+    pg_port = os.getenv("POSTGRES_PORT", "5432")
+    
+    # Build connection string; characters such as @ or / in the credentials must be escaped
+    db_connection_string = f"postgresql://{quote(pg_user, safe='')}:{quote(pg_password, safe='')}@{pg_host}:{pg_port}/{pg_db}?sslmode=require"
+    logger.info("Generated connection string from environment variables (password hidden): postgresql://%s:****@%s:%s/%s?sslmode=require", pg_user, pg_host, pg_port, pg_db)
+    
+    return _postgres_server_params(db_connection_string)
 
 
 def get_server_params(server_type: Literal["dialogue", "postgres"], db_connection_string: Optional[str] = None) -> StdioServerParameters:
@@ -285,126 +882,139 @@ def get_server_params(server_type: Literal["dialogue", "postgres"], db_connectio
     
     Args:
         server_type: The type of server to connect to
-        db_connection_string: PostgreSQL database connection string (if server_type is "postgres")
+        db_connection_string: PostgreSQL database connection string (if server_type is "postgres");
+            built from the POSTGRES_* environment variables when omitted
     
     Returns:
         StdioServerParameters for the specified server
     """
     if server_type == "dialogue":
-        return StdioServerParameters(
-            command="python",
-            args=["dialogue_server.py"]
-        )
+        return _DIALOGUE_SERVER_PARAMS
     elif server_type == "postgres":
-        # Build connection string from environment variables
-        pg_user = os.getenv("POSTGRES_USER")
-        pg_password = os.getenv("POSTGRES_PASSWORD")
-        pg_host = os.getenv("POSTGRES_HOST")
-        pg_port = os.getenv("POSTGRES_PORT", "5432")
-        pg_db = os.getenv("POSTGRES_DB")
-        
-        # Validate required environment variables
-        missing_vars = []
-        if not pg_user:
-            missing_vars.append("POSTGRES_USER")
-        if not pg_password:
-            missing_vars.append("POSTGRES_PASSWORD")
-        if not pg_host:
-            missing_vars.append("POSTGRES_HOST")
-        if not pg_db:
-            missing_vars.append("POSTGRES_DB")
-            
-        if missing_vars:
-            raise ValueError(f"Missing required environment variables: {', '.join(missing_vars)}")
-        
-        # Build connection string
-        db_connection_string = f"postgresql://{pg_user}:{pg_password}@{pg_host}:{pg_port}/{pg_db}?sslmode=require"
-        print(f"Generated connection string from environment variables (password hidden): postgresql://{pg_user}:****@{pg_host}:{pg_port}/{pg_db}?sslmode=require")
-        
-        return StdioServerParameters(
-            command="npx",
-            args=[
-                "-y",
-                "@modelcontextprotocol/server-postgres",
-                db_connection_string
-            ]
-        )
+        if db_connection_string:
+            return _postgres_server_params(db_connection_string)
+        return _postgres_env_server_params()
     else:
         raise ValueError(f"Unsupported server type: {server_type}")
 
 
-# Initialize Azure OpenAI client
-client = AsyncAzureOpenAI(
-    api_key=os.getenv("AZURE_OPENAI_API_KEY"),
-    api_version=os.getenv("AZURE_OPENAI_API_VERSION"),
-    azure_endpoint=os.getenv("AZURE_OPENAI_ENDPOINT")
-)
+@functools.lru_cache(maxsize=1)
+def get_openai_client() -> AsyncAzureOpenAI:
+    """
+    Create the Azure OpenAI client on first use.
+    
+    Building the client loads the TLS certificates, so importing this module or
+    printing --help does not pay for it.
+    
+    Returns:
+        The AsyncAzureOpenAI client shared by every agent
+    """
+    # Connection pool shared by every agent, sized for batch mode so concurrent
+    # conversations reuse warm TLS connections. HTTP/2 multiplexing is enabled when
+    # the optional h2 package is installed.
+    http_client = httpx.AsyncClient(
+        http2=importlib.util.find_spec("h2") is not None,
+        limits=httpx.Limits(max_connections=MAX_CONCURRENCY, max_keepalive_connections=MAX_CONCURRENCY),
+        timeout=httpx.Timeout(600, connect=5),
+    )
+    
+    return AsyncAzureOpenAI(
+        api_key=os.getenv("AZURE_OPENAI_API_KEY"),
+        api_version=os.getenv("AZURE_OPENAI_API_VERSION"),
+        azure_endpoint=os.getenv("AZURE_OPENAI_ENDPOINT"),
+        http_client=http_client
+    )
+
 
 deployment_name = os.getenv("AZURE_OPENAI_DEPLOYMENT_NAME")
 
 
+def build_parser() -> argparse.ArgumentParser:
+    """Build the command-line parser for client.py"""
+    # Options accepted after either subcommand
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument("--debug", action="store_true", help="Enable debug logging")
+    common.add_argument("--no-cache", action="store_true", help="Always call the model instead of the response cache")
+    
+    parser = argparse.ArgumentParser(description="Run an MCP tool-calling agent against Azure OpenAI")
+    subparsers = parser.add_subparsers(dest="server_type", required=True)
+    
+    dialogue = subparsers.add_parser("dialogue", parents=[common], help="Create a dialogue between Mary and someone")
+    dialogue.add_argument("name", nargs="?", help="Name of Mary's conversation partner")
+    dialogue.add_argument("--batch", metavar="FILE", help="Create a dialogue for every name in FILE (one per line)")
+    
+    postgres = subparsers.add_parser(
+        "postgres", parents=[common], help="Answer a question about the PostgreSQL database",
+        epilog="The connection settings are read from the POSTGRES_* environment variables."
+    )
+    postgres.add_argument("prompt", nargs="+", help="The question to answer")
+    postgres.add_argument("--refresh-schema", action="store_true", help="Ignore the recorded schema exploration")
+    
+    return parser
+
+
+_parser = build_parser()
+
+
 async def main():
     """Main function to run the appropriate agent based on command-line arguments."""
-    if len(sys.argv) < 2:
-        print("Usage:")
-        print("  For dialogue: python client.py dialogue <name>")
-        print("  For PostgreSQL: python client.py postgres [connection_string] <prompt> [--debug]")
-        sys.exit(1)
+    args = _parser.parse_args()
     
-    server_type = sys.argv[1]
+    if args.server_type == "dialogue" and (args.name is None) == (args.batch is None):
+        _parser.error("dialogue needs either a name or --batch FILE")
     
-    if server_type == "dialogue":
-        if len(sys.argv) != 3:
-            print("Usage: python client.py dialogue <name>")
-            sys.exit(1)
-        
-        name = sys.argv[2]
+    setup_logging("DEBUG" if args.debug else os.getenv("LOG_LEVEL", "WARNING"))
+    
+    cache = None if args.no_cache else LLMCache()
+    client = get_openai_client()
+    
+    if args.server_type == "dialogue":
         server_params = get_server_params("dialogue")
         
-        async with MCPClient(server_params) as mcp_client:
-            agent = DialogueAgent(client, deployment_name, mcp_client)
-            await agent.run(name)
+        async with MCPClient(server_params, cacheable_tools=_CACHEABLE_TOOLS["dialogue"]) as mcp_client:
+            agent = DialogueAgent(client, deployment_name, mcp_client, cache, stream_output=not args.batch)
+            if args.batch:
+                with open(args.batch, encoding="utf-8") as f:
+                    names = [line.strip() for line in f if line.strip()]
+                
+                # Independent conversations run concurrently instead of one after another
+                results = await agent.run_many(names)
+                for name, result in zip(names, results):
+                    print(f"\n=== Dialogue Output: {name} ===\n")
+                    if isinstance(result, Exception):
+                        logger.error("Error creating dialogue for %s: %s", name, result)
+                    elif result is None:
+                        print(f"No dialogue: stopped after {agent.max_tool_iterations} tool-calling turns")
+                    else:
+                        print(result)
+            else:
+                await agent.run(args.name)
     
-    elif server_type == "postgres":
-        db_connection_string = None
-        debug_mode = False
-        
-        # Extract args
-        args = sys.argv[2:]
-        
-        # Check for debug flag
-        if "--debug" in args:
-            debug_mode = True
-            args.remove("--debug")
-        
-        prompt = " ".join(args)
-        
-        if not prompt:
-            print("Usage: python client.py postgres [connection_string] <prompt> [--debug]")
-            print("Note: If connection_string is not provided, environment variables will be used")
-            sys.exit(1)
+    elif args.server_type == "postgres":
+        prompt = " ".join(args.prompt)
         
         try:
-            server_params = get_server_params("postgres", db_connection_string)
+            server_params = get_server_params("postgres")
             
-            async with MCPClient(server_params) as mcp_client:
-                agent = PostgreSQLAgent(client, deployment_name, mcp_client)
-                await agent.run(prompt, debug=debug_mode)
+            async with MCPClient(server_params, cacheable_tools=_CACHEABLE_TOOLS["postgres"]) as mcp_client:
+                agent = PostgreSQLAgent(client, deployment_name, mcp_client, cache,
+                                        refresh_schema=args.refresh_schema, stream_output=True)
+                await agent.run(prompt)
         except ValueError as e:
-            print(f"Error: {e}")
+            # Missing or invalid configuration; the message says what to fix
+            logger.error("Error: %s", e)
             sys.exit(1)
         except Exception as e:
-            print(f"Error: {e}")
-            import traceback
-            traceback.print_exc()
+            logger.exception("Error running the PostgreSQL agent: %s", e)
             sys.exit(1)
-    
-    else:
-        print(f"Unsupported server type: {server_type}")
-        print("Available server types: dialogue, postgres")
-        sys.exit(1)
 
 
 # Main execution
 if __name__ == "__main__":
-    asyncio.run(main())
+    with create_runner() as runner:
+        try:
+            runner.run(main())
+        finally:
+            # Close pooled connections on the loop that opened them
+            if get_openai_client.cache_info().currsize:
+                runner.run(get_openai_client().close())
@@ -1,5 +1,16 @@
 from mcp.server.fastmcp import FastMCP
 
+# Text placed around the phrase for each emotion the emotional tool knows
+_EMOTION_AFFIXES = {
+    "happy": ("😄 ", " 😄"),
+    "sad": ("😢 ", " 😢"),
+    "angry": ("😠 ", "! 😠"),
+    "excited": ("🤩 ", "!!! 🤩"),
+    "surprised": ("😲 ", "?! 😲"),
+    "worried": ("😟 ", "... 😟"),
+    "confused": ("🤔 ", "??? 🤔"),
+}
+
 class DialogueServer:
     """
     A server class for managing dialogue-related MCP tools.
@@ -22,31 +33,25 @@ class DialogueServer:
         @self.mcp.tool()
         def sarcasm(phrase: str) -> str:
             """Turns a phrase into a sarcastic remark."""
-            sarcastic_phrase = ""
-            
-            for i, char in enumerate(phrase):
-                if i % 2 == 0:
-                    sarcastic_phrase += char.upper()
-                else:
-                    sarcastic_phrase += char.lower()
+            # Alternate the case character by character, building the string once
+            sarcastic_phrase = "".join(
+                char.lower() if i & 1 else char.upper()
+                for i, char in enumerate(phrase)
+            )
             
             return sarcastic_phrase + " 🙃"
         
         @self.mcp.tool()
         def emotional(phrase: str, emotion: str) -> str:
             """Expresses a phrase with a specific emotion like happy, sad, angry, excited, etc."""
-            emotion_map = {
-                "happy": f"😄 {phrase} 😄",
-                "sad": f"😢 {phrase} 😢",
-                "angry": f"😠 {phrase}! 😠",
-                "excited": f"🤩 {phrase}!!! 🤩",
-                "surprised": f"😲 {phrase}?! 😲",
-                "worried": f"😟 {phrase}... 😟",
-                "confused": f"🤔 {phrase}??? 🤔"
-            }
+            affix = _EMOTION_AFFIXES.get(emotion.lower())
             
             # Default to a generic emotion if not found
-            return emotion_map.get(emotion.lower(), f"[{emotion.upper()}] {phrase}")
+            if affix is None:
+                return f"[{emotion.upper()}] {phrase}"
+            
+            prefix, suffix = affix
+            return f"{prefix}{phrase}{suffix}"
     
     def run(self, transport: str = "stdio"):
         """Run the MCP server with the specified transport"""
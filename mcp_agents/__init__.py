@@ -1,8 +1,16 @@
 """
 MCP Agent definitions for the multi-agent chat system.
-"""
 
-# Import only the AgentManager class directly
-from mcp_agents.agent_manager import AgentManager
+Each agent module keeps its system message in a module constant (e.g.
+_DIALOGUE_SYSMSG), so the message is byte-identical across agent constructions
+and the model provider can cache the prompt prefix.
+"""
 
+# AgentManager is resolved on first access so that importing the package
+# (e.g. for the semantic cache) does not load autogen.
 # The other modules will be imported only when needed
+def __getattr__(name):
+    if name == "AgentManager":
+        from mcp_agents.agent_manager import AgentManager
+        return AgentManager
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
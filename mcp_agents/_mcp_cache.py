@@ -0,0 +1,197 @@
+"""
+Process-wide cache of MCP server tools, keyed by server parameters.
+"""
+import asyncio
+import hashlib
+import inspect
+import json
+import logging
+import os
+import time
+from typing import Dict, List, Optional, Tuple
+
+from autogen_ext.tools.mcp import StdioMcpToolAdapter, StdioServerParams, mcp_server_tools
+from mcp import ClientSession
+from mcp.client.stdio import stdio_client
+from mcp.types import Tool
+
+logger = logging.getLogger(__name__)
+
+# Tool adapters already fetched for each server
+_tool_cache: Dict[tuple, List] = {}
+
+# One lock per server so different servers still start concurrently
+_locks: Dict[tuple, asyncio.Lock] = {}
+
+# Background tasks holding long-lived MCP sessions open, with the event that stops them
+_session_tasks: Dict[tuple, Tuple[asyncio.Task, asyncio.Event]] = {}
+
+# Newer autogen versions let tools share one session instead of spawning the
+# server subprocess for every call
+_SUPPORTS_SESSION = "session" in inspect.signature(mcp_server_tools).parameters
+
+# Without shared sessions every tool call starts its own server, so the tool list is
+# persisted between runs to avoid starting one at startup just to list the tools
+TOOLS_CACHE_PATH = os.getenv("MCP_TOOLS_CACHE_PATH", ".mcp_tools_cache.json")
+TOOLS_CACHE_TTL = float(os.getenv("MCP_TOOLS_CACHE_TTL", "86400"))
+
+
+def _server_key(server_params: StdioServerParams) -> tuple:
+    return (server_params.command, tuple(server_params.args))
+
+
+def _disk_key(server_params: StdioServerParams) -> str:
+    """
+    Key of a server in the on-disk tool cache.
+
+    Local files on the command line (e.g. the server script) contribute their
+    modification time, so editing them invalidates the entry. The key is hashed so
+    connection strings with passwords are not written to disk.
+    """
+    parts = [server_params.command, *server_params.args]
+    parts.extend(str(os.stat(arg).st_mtime_ns) for arg in server_params.args if os.path.isfile(arg))
+    return hashlib.sha256("\0".join(parts).encode("utf-8")).hexdigest()
+
+
+def _read_tools_cache() -> Dict[str, Dict]:
+    try:
+        with open(TOOLS_CACHE_PATH, encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+    except (OSError, ValueError) as e:
+        logger.warning("Ignoring unreadable MCP tools cache %s: %s", TOOLS_CACHE_PATH, e)
+        return {}
+
+
+def _load_tool_descriptors(key: str) -> Optional[List[Tool]]:
+    """Return the tool descriptors stored for a server, or None if missing or expired"""
+    entry = _read_tools_cache().get(key)
+    if entry is None or time.time() - entry["saved_at"] > TOOLS_CACHE_TTL:
+        return None
+    return [Tool.model_validate(tool) for tool in entry["tools"]]
+
+
+def _write_tools_cache(data: Dict[str, Dict]):
+    try:
+        with open(TOOLS_CACHE_PATH, "w", encoding="utf-8") as f:
+            json.dump(data, f)
+    except OSError as e:
+        logger.warning("Could not save MCP tools cache to %s: %s", TOOLS_CACHE_PATH, e)
+
+
+def _save_tool_descriptors(key: str, descriptors: List[Tool]):
+    data = _read_tools_cache()
+    data[key] = {"saved_at": time.time(), "tools": [tool.model_dump(mode="json") for tool in descriptors]}
+    _write_tools_cache(data)
+
+
+def _forget_tool_descriptors(key: str):
+    data = _read_tools_cache()
+    if data.pop(key, None) is not None:
+        _write_tools_cache(data)
+
+
+class _PersistedToolAdapter(StdioMcpToolAdapter):
+    """
+    Tool adapter whose tool list is persisted between runs.
+
+    A persisted list lets the agent start without the server, so a server that
+    cannot start (e.g. wrong database credentials) is only noticed when a tool
+    is called. A failed call forgets the list, so the next run starts the server
+    to list its tools again instead of trusting the list until it expires.
+    """
+
+    def __init__(self, server_params: StdioServerParams, tool: Tool, disk_key: str):
+        super().__init__(server_params=server_params, tool=tool)
+        self._disk_key = disk_key
+
+    async def run(self, args, cancellation_token):
+        try:
+            return await super().run(args, cancellation_token)
+        except Exception:
+            _forget_tool_descriptors(self._disk_key)
+            raise
+
+
+async def _list_tool_descriptors(server_params: StdioServerParams, key: str) -> List[Tool]:
+    """Start the server once to list its tools, or reuse the list from the last run"""
+    descriptors = _load_tool_descriptors(key)
+    if descriptors is None:
+        async with stdio_client(server_params) as (read, write):
+            async with ClientSession(read, write) as session:
+                await session.initialize()
+                descriptors = (await session.list_tools()).tools
+        _save_tool_descriptors(key, descriptors)
+    else:
+        logger.debug("Loaded %d tools for %s from %s", len(descriptors), server_params.command, TOOLS_CACHE_PATH)
+    return descriptors
+
+
+async def _hold_session(server_params: StdioServerParams, ready: asyncio.Future, stop: asyncio.Event):
+    """
+    Open an MCP session and keep it open until stop is set.
+
+    The stdio client's context must be exited by the task that entered it, so the
+    session lives in its own task rather than in whichever task first needed it.
+    """
+    from autogen_ext.tools.mcp import create_mcp_server_session
+
+    try:
+        async with create_mcp_server_session(server_params) as session:
+            await session.initialize()
+            ready.set_result(session)
+            await stop.wait()
+    except Exception as e:
+        if not ready.done():
+            ready.set_exception(e)
+        else:
+            logger.exception("MCP session for %s closed with an error: %s", server_params.command, e)
+
+
+async def _open_session(server_params: StdioServerParams):
+    """Start a background task holding a session for the server and return the session"""
+    ready = asyncio.get_running_loop().create_future()
+    stop = asyncio.Event()
+    task = asyncio.create_task(_hold_session(server_params, ready, stop))
+    session = await ready
+    _session_tasks[_server_key(server_params)] = (task, stop)
+    return session
+
+
+async def cached_mcp_tools(server_params: StdioServerParams) -> List:
+    """
+    Return the tools for an MCP server, starting the server only on the first call.
+
+    Args:
+        server_params: Parameters used to launch the MCP server
+
+    Returns:
+        List of tool adapters for the server
+    """
+    key = _server_key(server_params)
+    tools = _tool_cache.get(key)
+    if tools is not None:
+        return tools
+
+    async with _locks.setdefault(key, asyncio.Lock()):
+        tools = _tool_cache.get(key)
+        if tools is None:
+            if _SUPPORTS_SESSION:
+                session = await _open_session(server_params)
+                tools = await mcp_server_tools(server_params, session=session)
+            else:
+                disk_key = _disk_key(server_params)
+                descriptors = await _list_tool_descriptors(server_params, disk_key)
+                tools = [_PersistedToolAdapter(server_params, tool, disk_key) for tool in descriptors]
+            _tool_cache[key] = tools
+    return tools
+
+
+async def close_mcp_sessions():
+    """Close all long-lived MCP sessions and forget the cached tools"""
+    for task, stop in _session_tasks.values():
+        stop.set()
+    await asyncio.gather(*(task for task, _ in _session_tasks.values()), return_exceptions=True)
+    _session_tasks.clear()
+    _tool_cache.clear()
@@ -1,10 +1,33 @@
-from typing import Dict, List, Optional, Any, Callable
+from typing import Dict, List, Optional, Any, Callable, Final, Tuple
 import asyncio
 import importlib
+import logging
 
 from autogen_agentchat.agents import AssistantAgent
 from autogen_agentchat.teams import SelectorGroupChat
 from autogen_agentchat.conditions import TextMentionTermination, MaxMessageTermination
+from autogen_core.models import SystemMessage, UserMessage
+
+from mcp_agents.history_window import HistoryWindow, WindowedSelectorGroupChat
+
+logger = logging.getLogger(__name__)
+
+# Selector prompt passed to SelectorGroupChat. SelectorGroupChat fills in the
+# {roles}, {participants} and {history} placeholders itself on every turn, so the
+# template is kept byte-identical across chats.
+_SELECTOR_PROMPT: Final[str] = """
+        Below is a conversation where a user has made a request, and a planner is coordinating specialized agents to fulfill it.
+        The planner has already created a plan with specific tasks for each agent based on their capabilities.
+        
+        Team members and their roles:
+        {roles}
+        
+        Based on the current conversation and tasks being discussed, which team member should respond next?
+        Select one team member from {participants} who is best suited to handle the current task or situation.
+        Return only the name of the selected team member.
+        
+        {history}
+        """
 
 class AgentManager:
     """
@@ -30,13 +53,19 @@ class AgentManager:
         self.model_client = model_client
         self.available_agents = {}
         
+        # Agents built for the current set of enabled agents, reused by later chats
+        self._agents_cache: Optional[List[AssistantAgent]] = None
+        self._agents_cache_key: Optional[tuple] = None
+        self._agents_lock = asyncio.Lock()
+        
         # Define available agent types and their module paths for lazy loading
         # NOTE: agent_typesについて:
         # このディクショナリは利用可能なエージェントタイプを定義し、遅延ロードに必要な情報を保持します:
         # - module: エージェント作成関数が定義されているモジュールのパス
         # - function: 実際にエージェントを作成する関数の名前
-        # - loaded: このエージェントタイプがすでにロードされているかどうか
-        # - create_fn: ロード済みの場合、キャッシュされた関数オブジェクト
+        # - loaded: このエージェントタイプのロードをすでに試みたかどうか
+        # - create_fn: ロード済みの場合、キャッシュされた関数オブジェクト (ロードに失敗した場合はNone)
+        # - is_async: create_fnがasync関数かどうか (ロード時に一度だけ判定される)
         #
         # 遅延ロードにより、エージェントは実際に必要になった時点でのみロードされます。
         # これにより、使用しないエージェントのモジュールは読み込まれず、メモリとロード時間が節約されます。
@@ -58,6 +87,13 @@ class AgentManager:
                 "function": "create_formatter_agent",
                 "loaded": False,
                 "create_fn": None
+            },
+            # The planner is always added after the enabled agents, so it has no entry in agent_config
+            "planner_agent": {
+                "module": "mcp_agents.planner_agent",
+                "function": "create_planner_agent",
+                "loaded": False,
+                "create_fn": None
             }
             # Custom agents can be added here
         }
@@ -81,11 +117,12 @@ class AgentManager:
         """
         agent_info = self.agent_types.get(agent_type)
         if not agent_info:
-            print(f"Unknown agent type: {agent_type}")
+            logger.warning("Unknown agent type: %s", agent_type)
             return None
             
-        # Return cached function if already loaded
-        if agent_info["loaded"] and agent_info["create_fn"]:
+        # Return the cached result if already loaded, including a failed load,
+        # so a broken module path is not searched for again on every chat
+        if agent_info["loaded"]:
             return agent_info["create_fn"]
             
         # Otherwise, load the module and function
@@ -96,13 +133,13 @@ class AgentManager:
             # Cache the loaded function
             self.agent_types[agent_type]["loaded"] = True
             self.agent_types[agent_type]["create_fn"] = create_fn
+            self.agent_types[agent_type]["is_async"] = asyncio.iscoroutinefunction(create_fn)
             
-            print(f"Loaded agent function {agent_info['function']} from {agent_info['module']}")
+            logger.debug("Loaded agent function %s from %s", agent_info["function"], agent_info["module"])
             return create_fn
         except Exception as e:
-            print(f"Error loading agent function for {agent_type}: {e}")
-            import traceback
-            traceback.print_exc()
+            logger.exception("Error loading agent function for %s: %s", agent_type, e)
+            agent_info["loaded"] = True
             return None
     
     def register_agent_type(self, agent_name: str, module_path: str, function_name: str, enabled: bool = False):
@@ -122,7 +159,7 @@ class AgentManager:
             "create_fn": None
         }
         self.agent_config[agent_name] = enabled
-        print(f"Registered new agent type: {agent_name} (enabled: {enabled})")
+        logger.info("Registered new agent type: %s (enabled: %s)", agent_name, enabled)
     
     def configure_agents(self, config: Dict[str, bool]):
         """
@@ -130,86 +167,121 @@ class AgentManager:
         
         Args:
             config: Dictionary of agent_name: is_enabled
+        
+        Raises:
+            ValueError: If config names an agent type that was not registered
         """
+        # Fail here rather than when the next chat is created
+        unknown = [name for name in config if name not in self.agent_config]
+        if unknown:
+            raise ValueError(f"Unknown agent types: {', '.join(unknown)}")
+        
+        if all(self.agent_config[name] == is_enabled for name, is_enabled in config.items()):
+            return
+        
         self.agent_config.update(config)
-        print(f"Updated agent configuration: {self.agent_config}")
+        logger.info("Updated agent configuration: %s", self.agent_config)
     
-    async def initialize_agents(self) -> List[AssistantAgent]:
+    async def initialize_agents(self, use_cache: bool = True) -> List[AssistantAgent]:
         """
         Initialize all enabled agents based on the current configuration.
         
+        Args:
+            use_cache: Return the agents already built for the same configuration, if any.
+                Pass False when the agents must not be shared with another running chat.
+        
         Returns:
             List of initialized agents including the planner
         """
-        print("Initializing agents based on configuration...")
+        if not use_cache:
+            agents, _ = await self._build_agents()
+            return agents
+        
+        key = tuple(name for name, is_enabled in self.agent_config.items() if is_enabled)
+        async with self._agents_lock:
+            if self._agents_cache is not None and self._agents_cache_key == key:
+                return self._agents_cache
+            
+            agents, complete = await self._build_agents()
+            # A failure may be transient (e.g. the database was unreachable), so an
+            # incomplete team is rebuilt on the next call instead of being kept
+            if complete:
+                self._agents_cache = agents
+                self._agents_cache_key = key
+            return agents
+    
+    async def _build_agents(self) -> Tuple[List[AssistantAgent], bool]:
+        """
+        Create the enabled agents and the planner.
+        
+        Returns:
+            Tuple of (list of created agents including the planner, whether every
+            enabled agent and the planner were created)
+        """
+        logger.info("Initializing agents based on configuration...")
         worker_agents = []
+        enabled_count = sum(1 for is_enabled in self.agent_config.values() if is_enabled)
         
-        # Initialize each enabled agent type
+        # Start each enabled agent's creation concurrently. Creation functions spawn
+        # MCP server subprocesses for tool discovery, so overlapping them makes
+        # startup take as long as the slowest server rather than the sum of all.
+        pending_types = []
+        pending_creations = []
         for agent_type, is_enabled in self.agent_config.items():
             if is_enabled:
-                try:
-                    # Get the creation function for this agent type
-                    create_fn = self._load_agent_function(agent_type)
-                    
-                    if create_fn:
-                        # Create the agent (creation functions may be async)
-                        agent = await create_fn(self.model_client) if asyncio.iscoroutinefunction(create_fn) else create_fn(self.model_client)
-                        
-                        if agent:  # Only add if agent was successfully created
-                            worker_agents.append(agent)
-                            self.available_agents[agent_type] = agent
-                            print(f"Added {agent_type} to available agents")
-                    else:
-                        print(f"Could not load creation function for {agent_type}")
-                    
-                except Exception as e:
-                    print(f"Error initializing {agent_type}: {e}")
-                    import traceback
-                    traceback.print_exc()
+                # Get the creation function for this agent type
+                create_fn = self._load_agent_function(agent_type)
+                
+                if create_fn:
+                    pending_types.append(agent_type)
+                    pending_creations.append(self._create_agent(create_fn, self.agent_types[agent_type]["is_async"]))
+                else:
+                    logger.warning("Could not load creation function for %s", agent_type)
+        
+        results = await asyncio.gather(*pending_creations, return_exceptions=True)
+        
+        for agent_type, result in zip(pending_types, results):
+            if isinstance(result, Exception):
+                logger.error("Error initializing %s: %s", agent_type, result, exc_info=result)
+            elif result:  # Only add if agent was successfully created
+                worker_agents.append(result)
+                self.available_agents[agent_type] = result
+                logger.info("Added %s to available agents", agent_type)
         
         if not worker_agents:
-            print("Warning: No worker agents were successfully initialized!")
-            return []
+            logger.warning("No worker agents were successfully initialized!")
+            return [], False
+        
+        complete = len(worker_agents) == enabled_count
             
         # Get the names of initialized agents for the planner
         agent_names = [agent.name for agent in worker_agents]
         
         # Create and add the planner agent - load dynamically
-        planner_fn = self._load_agent_function("planner_agent") or self._load_planner()
+        planner_fn = self._load_agent_function("planner_agent")
         if planner_fn:
             planner = planner_fn(self.model_client, agent_names)
             worker_agents.append(planner)
         else:
-            print("Error: Could not load planner agent!")
+            logger.error("Could not load planner agent!")
+            complete = False
         
-        return worker_agents
+        return worker_agents, complete
     
-    def _load_planner(self):
+    async def _create_agent(self, create_fn: Callable, is_async: bool):
         """
-        Load the planner agent creation function directly if not in agent_types.
-        This is a fallback method.
-        """
-        try:
-            # Add planner to agent_types
-            self.agent_types["planner_agent"] = {
-                "module": "mcp_agents.planner_agent",
-                "function": "create_planner_agent",
-                "loaded": False,
-                "create_fn": None
-            }
-            return self._load_agent_function("planner_agent")
-        except Exception as e:
-            print(f"Error loading planner module: {e}")
-            import traceback
-            traceback.print_exc()
+        Create an agent with the given creation function.
+        
+        Args:
+            create_fn: The agent creation function (may be async)
+            is_async: Whether create_fn is a coroutine function
             
-            # As a last resort, try direct import
-            try:
-                from mcp_agents.planner_agent import create_planner_agent
-                return create_planner_agent
-            except:
-                print("Critical error: Failed to load planner agent!")
-                return None
+        Returns:
+            The created agent or None
+        """
+        if is_async:
+            return await create_fn(self.model_client)
+        return create_fn(self.model_client)
     
     def create_selector_prompt(self) -> str:
         """Create the selector prompt for SelectorGroupChat"""
@@ -220,19 +292,7 @@ class AgentManager:
         #   例: ["dialogue_agent", "postgres_agent", "planner"]
         # {history}: これまでの会話履歴。各メッセージは "agent_name: message_content" の形式。
         #   これにより、どのエージェントが次に回答すべきかを決定するための文脈が提供される。
-        return """
-        Below is a conversation where a user has made a request, and a planner is coordinating specialized agents to fulfill it.
-        The planner has already created a plan with specific tasks for each agent based on their capabilities.
-        
-        Team members and their roles:
-        {roles}
-        
-        Based on the current conversation and tasks being discussed, which team member should respond next?
-        Select one team member from {participants} who is best suited to handle the current task or situation.
-        Return only the name of the selected team member.
-        
-        {history}
-        """
+        return _SELECTOR_PROMPT
     
     def create_termination_condition(self, keyword: str = "[TERMINATE_ALL]", max_turns: int = 15):
         """Create a termination condition for the chat"""
@@ -247,10 +307,14 @@ class AgentManager:
         max_msg_termination = MaxMessageTermination(max_messages=max_turns)
         return text_termination | max_msg_termination
     
-    async def create_chat(self) -> Optional[SelectorGroupChat]:
+    async def create_chat(self, reuse_agents: bool = True) -> Optional[SelectorGroupChat]:
         """
         Create a SelectorGroupChat with all initialized agents.
         
+        Args:
+            reuse_agents: Reuse the agents built for the current configuration.
+                Chats that run alongside another chat need their own agents.
+        
         Returns:
             SelectorGroupChat instance or None if no agents were initialized
         """
@@ -263,19 +327,56 @@ class AgentManager:
         # このクラスは各ターンで最適なエージェントを選び、そのエージェントに返答を生成させる
         
         # Initialize all enabled agents
-        all_agents = await self.initialize_agents()
+        all_agents = await self.initialize_agents(use_cache=reuse_agents)
         
         if not all_agents:
-            print("Error: No agents available. Cannot create chat.")
+            logger.error("No agents available. Cannot create chat.")
             return None
         
-        # Create the SelectorGroupChat
-        chat = SelectorGroupChat(
+        # Create the SelectorGroupChat, keeping the selector's {history} short:
+        # recent messages plus a rolling summary
+        chat = WindowedSelectorGroupChat(
             participants=all_agents,
             model_client=self.model_client,
             selector_prompt=self.create_selector_prompt(),
-            termination_condition=self.create_termination_condition()
+            termination_condition=self.create_termination_condition(),
+            history_window=HistoryWindow(self.model_client),
         )
         
-        print(f"Created SelectorGroupChat with {len(all_agents)} agents")
-        return chat 
+        logger.info("Created SelectorGroupChat with %d agents", len(all_agents))
+        return chat
+    
+    async def close(self):
+        """Shut down the MCP server sessions shared by the agents"""
+        from mcp_agents._mcp_cache import close_mcp_sessions
+        await close_mcp_sessions()
+    
+    async def suggest_followups(self, last_query: str, last_response: str, max_suggestions: int = 2) -> List[str]:
+        """
+        Suggest likely follow-up questions for the last exchange.
+        
+        Args:
+            last_query: The user's last query
+            last_response: The response that was returned for it
+            max_suggestions: Maximum number of follow-ups to return
+            
+        Returns:
+            List of follow-up queries, empty if none could be generated
+        """
+        try:
+            result = await self.model_client.create([
+                SystemMessage(content=(
+                    "Predict the questions the user is most likely to ask next. "
+                    f"Reply with at most {max_suggestions} questions, one per line, with no numbering or extra text."
+                )),
+                UserMessage(content=f"Question: {last_query}\nAnswer: {last_response}", source="user"),
+            ])
+        except Exception as e:
+            logger.warning("Error suggesting follow-up queries: %s", e)
+            return []
+        
+        if not isinstance(result.content, str):
+            return []
+        
+        followups = [line.strip(" -*\t") for line in result.content.splitlines()]
+        return [line for line in followups if line][:max_suggestions]
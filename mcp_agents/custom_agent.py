@@ -1,8 +1,12 @@
 """
 Template for creating a custom agent.
 """
+import logging
+
 from autogen_agentchat.agents import AssistantAgent
 
+logger = logging.getLogger(__name__)
+
 def create_custom_agent(model_client):
     """
     Create a custom agent - a template for adding new types of agents.
@@ -13,18 +17,19 @@ def create_custom_agent(model_client):
     Returns:
         The custom agent instance
     """
-    print("Initializing custom agent...")
+    logger.debug("Initializing custom agent...")
     
     # Create the custom agent
     custom_agent = AssistantAgent(
         name="custom_agent",
         description="A custom agent that can be modified for specific tasks. This is a template.",
         model_client=model_client,
+        model_client_stream=True,
         system_message=(
             "You are a custom agent that can be adapted for specific tasks. "
             "This is a template that can be modified to create new agent types with specialized capabilities."
         )
     )
     
-    print("Custom agent initialized")
+    logger.debug("Custom agent initialized")
     return custom_agent 
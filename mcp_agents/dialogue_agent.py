@@ -1,12 +1,23 @@
 import os
+import logging
 from typing import List
 
 from autogen_agentchat.agents import AssistantAgent
-from autogen_ext.tools.mcp import StdioServerParams, mcp_server_tools
+from autogen_ext.tools.mcp import StdioServerParams
+
+from mcp_agents._mcp_cache import cached_mcp_tools
+
+logger = logging.getLogger(__name__)
+
+_DIALOGUE_SYSMSG = (
+    "You are a dialogue assistant that can create conversations between characters. "
+    "Use the available tools to generate interesting dialogue. "
+    "For yelling, use the 'yell' tool. For sarcasm, use the 'sarcasm' tool. "
+)
 
 async def get_dialogue_tools() -> List:
     """Get MCP tools for dialogue server"""
-    print("Getting dialogue tools...")
+    logger.debug("Getting dialogue tools...")
     
     server_params = StdioServerParams(
         command="python",
@@ -14,20 +25,20 @@ async def get_dialogue_tools() -> List:
     )
     
     try:
-        tools = await mcp_server_tools(server_params)
-        print(f"Found {len(tools)} dialogue tools")
-        for tool in tools:
-            print(f"- Tool: {tool.name}")
+        # Reuses the running server and its tool list after the first call
+        tools = await cached_mcp_tools(server_params)
+        logger.info("Found %d dialogue tools", len(tools))
+        if logger.isEnabledFor(logging.DEBUG):
+            for tool in tools:
+                logger.debug("- Tool: %s", tool.name)
         return tools
     except Exception as e:
-        print(f"Error getting dialogue tools: {e}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("Error getting dialogue tools: %s", e)
         return []
 
 async def create_dialogue_agent(model_client):
     """Create dialogue agent with tools"""
-    print("Initializing dialogue agent...")
+    logger.debug("Initializing dialogue agent...")
     
     # Get dialogue tools
     dialogue_tools = await get_dialogue_tools()
@@ -37,17 +48,14 @@ async def create_dialogue_agent(model_client):
         name="dialogue_agent",
         description="Creates conversations, dialogues, and interactions between characters. Can express emotions like yelling and sarcasm.",
         model_client=model_client,
-        tools=dialogue_tools if dialogue_tools else None,
-        system_message=(
-            "You are a dialogue assistant that can create conversations between characters. "
-            "Use the available tools to generate interesting dialogue. "
-            "For yelling, use the 'yell' tool. For sarcasm, use the 'sarcasm' tool. "
-        )
+        model_client_stream=True,
+        tools=dialogue_tools or None,
+        system_message=_DIALOGUE_SYSMSG
     )
     
     if dialogue_tools:
-        print("Dialogue agent initialized with tools")
+        logger.debug("Dialogue agent initialized with tools")
     else:
-        print("No dialogue tools found, agent created without tools")
+        logger.warning("No dialogue tools found, agent created without tools")
         
     return dialogue_agent 
@@ -0,0 +1,164 @@
+"""
+Bounded conversation history for the SelectorGroupChat speaker selector.
+"""
+import asyncio
+import logging
+from typing import Callable, List, Optional, Sequence
+
+from autogen_agentchat.base import TerminationCondition
+from autogen_agentchat.messages import BaseAgentEvent, BaseChatMessage, MessageFactory, TextMessage
+from autogen_agentchat.teams import SelectorGroupChat
+from autogen_agentchat.teams._group_chat._selector_group_chat import SelectorGroupChatManager
+from autogen_core.models import SystemMessage, UserMessage
+
+logger = logging.getLogger(__name__)
+
+_SUMMARY_PROMPT = (
+    "Summarize the conversation below in one short paragraph. "
+    "Keep the user's request, which agents have already answered, and any open tasks."
+)
+
+
+class HistoryWindow:
+    """
+    Keeps the selector prompt short on long conversations.
+
+    Once enough chat messages have accumulated, all but the most recent ones are
+    collapsed into a rolling summary by a background model call. Every message the
+    summary does not cover yet is passed on in full, so nothing is dropped while a
+    summary is pending. The summary text only changes when a new batch is
+    collapsed, so the prompt prefix stays stable between turns.
+    """
+
+    def __init__(self, model_client=None, max_messages: int = 8, summary_after: int = 16):
+        """
+        Initialize the history window.
+
+        Args:
+            model_client: Optional model client used to summarize older messages
+            max_messages: Number of recent messages left out of a new summary
+            summary_after: Number of unsummarized messages that triggers a new summary
+        """
+        self._model_client = model_client
+        self._max_messages = max_messages
+        self._summary_after = summary_after
+        self._summary = ""
+        self._summarized = 0  # Number of leading chat messages covered by the summary
+        self._summary_task: Optional[asyncio.Task] = None
+
+    def window(self, thread: Sequence[BaseAgentEvent | BaseChatMessage]) -> List[BaseChatMessage]:
+        """Return the summary, if any, followed by the chat messages it does not cover"""
+        messages = [message for message in thread if isinstance(message, BaseChatMessage)]
+
+        pending = len(messages) - self._summarized
+        if (
+            self._model_client is not None
+            and pending >= self._summary_after
+            and (self._summary_task is None or self._summary_task.done())
+        ):
+            end = len(messages) - self._max_messages
+            self._summary_task = asyncio.create_task(self._summarize(messages[self._summarized:end], end))
+
+        recent = messages[self._summarized:]
+        if self._summary:
+            return [TextMessage(content=f"Summary of the earlier conversation: {self._summary}", source="summary")] + recent
+        return recent
+
+    async def _summarize(self, messages: List[BaseChatMessage], end: int):
+        """Collapse the given messages, which end at index end, into the rolling summary"""
+        lines = [f"{message.source}: {message.to_model_text()}" for message in messages]
+        if self._summary:
+            lines.insert(0, f"Earlier summary: {self._summary}")
+
+        try:
+            result = await self._model_client.create([
+                SystemMessage(content=_SUMMARY_PROMPT),
+                UserMessage(content="\n".join(lines), source="user"),
+            ])
+        except Exception as e:
+            logger.warning("Error summarizing selector history: %s", e)
+            return
+
+        if isinstance(result.content, str):
+            self._summary = result.content.strip()
+            self._summarized = end
+
+    def clear(self):
+        """Clear the summary when the chat starts over"""
+        if self._summary_task is not None and not self._summary_task.done():
+            self._summary_task.cancel()
+        self._summary_task = None
+        self._summary = ""
+        self._summarized = 0
+
+
+class _WindowedSelectorGroupChatManager(SelectorGroupChatManager):
+    """Selector manager that picks the next speaker from the windowed history"""
+
+    def __init__(self, history_window: HistoryWindow, *args):
+        super().__init__(*args)
+        self._history_window = history_window
+
+    async def select_speaker(self, thread: List[BaseAgentEvent | BaseChatMessage]) -> str:
+        # The selector builds its {history} from the thread it is given
+        return await super().select_speaker(self._history_window.window(thread))
+
+    async def reset(self) -> None:
+        await super().reset()
+        self._history_window.clear()
+
+
+class WindowedSelectorGroupChat(SelectorGroupChat):
+    """
+    SelectorGroupChat whose speaker selector sees a HistoryWindow of the conversation.
+
+    The agents still receive every message; only the selector prompt is shortened.
+    """
+
+    def __init__(self, *args, history_window: Optional[HistoryWindow] = None, **kwargs):
+        """
+        Initialize the chat.
+
+        Args:
+            history_window: Window applied to the selector's history; defaults to one
+                without summaries, which passes the full history
+            *args, **kwargs: Passed on to SelectorGroupChat
+        """
+        super().__init__(*args, **kwargs)
+        self._history_window = history_window or HistoryWindow()
+        # The runtime checks that the manager factory returns exactly this class
+        self._base_group_chat_manager_class = _WindowedSelectorGroupChatManager
+
+    def _create_group_chat_manager_factory(
+        self,
+        name: str,
+        group_topic_type: str,
+        output_topic_type: str,
+        participant_topic_types: List[str],
+        participant_names: List[str],
+        participant_descriptions: List[str],
+        output_message_queue: asyncio.Queue,
+        termination_condition: Optional[TerminationCondition],
+        max_turns: Optional[int],
+        message_factory: MessageFactory,
+    ) -> Callable[[], SelectorGroupChatManager]:
+        # Same arguments as SelectorGroupChat's own factory, with the window in front
+        return lambda: _WindowedSelectorGroupChatManager(
+            self._history_window,
+            name,
+            group_topic_type,
+            output_topic_type,
+            participant_topic_types,
+            participant_names,
+            participant_descriptions,
+            output_message_queue,
+            termination_condition,
+            max_turns,
+            message_factory,
+            self._model_client,
+            self._selector_prompt,
+            self._allow_repeated_speaker,
+            self._selector_func,
+            self._max_selector_attempts,
+            self._candidate_func,
+        )
@@ -0,0 +1,55 @@
+"""
+Logging and event loop setup shared by the command-line entry points.
+"""
+import asyncio
+import logging
+import sys
+from typing import Iterable
+
+# Loggers belonging to this project; third-party loggers stay at WARNING
+APP_LOGGERS = ("__main__", "autogen_agent", "client", "mcp_agents")
+
+
+def setup_logging(level: str = "INFO", app_loggers: Iterable[str] = APP_LOGGERS) -> logging.Handler:
+    """
+    Write log records to stdout as plain progress lines.
+
+    Records are written synchronously by the thread that logs them, so progress
+    lines stay in order with streamed tokens and responses printed to stdout.
+
+    Args:
+        level: Level for this project's loggers, e.g. "INFO" or "DEBUG"
+        app_loggers: Names of the loggers that get this level
+
+    Returns:
+        The handler attached to the root logger
+    """
+    stream_handler = logging.StreamHandler(sys.stdout)
+    stream_handler.setFormatter(logging.Formatter("%(message)s"))
+
+    root = logging.getLogger()
+    root.addHandler(stream_handler)
+    root.setLevel(logging.WARNING)
+    for name in app_loggers:
+        logging.getLogger(name).setLevel(level.upper())
+
+    return stream_handler
+
+
+def create_runner() -> asyncio.Runner:
+    """
+    Create the asyncio.Runner for an entry point.
+
+    The runner uses uvloop's libuv-based event loop when it is installed (it is
+    not available on Windows) and the default loop otherwise.
+
+    Returns:
+        A new asyncio.Runner, to be used as a context manager
+    """
+    try:
+        import uvloop
+        loop_factory = uvloop.new_event_loop
+    except ImportError:
+        loop_factory = None
+
+    return asyncio.Runner(loop_factory=loop_factory)
@@ -1,5 +1,40 @@
+import functools
+import logging
+from typing import Tuple
+
 from autogen_agentchat.agents import AssistantAgent
 
+logger = logging.getLogger(__name__)
+
+# Only the agent list varies, and it is fixed for a given configuration, so the
+# system message stays byte-identical across chats
+_PLANNER_SYSMSG = (
+    "You are a planner that assigns tasks to the following specialized agents:\n"
+    "{agents}\n\n"
+    "Respond concisely. Only invoke an agent if truly necessary. "
+    "Once an agent finishes its role (it signals with its termination message), do not invoke it again."
+    "When you have completed your part, please end your reply with [TERMINATE_ALL]."
+)
+
+# Description of each agent the planner can assign tasks to
+_AGENT_DESCRIPTIONS = {
+    "dialogue_agent": "for generating character-based dialogues",
+    "postgres_agent": "for querying the PostgreSQL database",
+    "formatter_agent": "for formatting data into clean, human-friendly responses"
+}
+
+
+@functools.lru_cache(maxsize=8)
+def _planner_system_message(agent_names: Tuple[str, ...]) -> str:
+    """Build the planner's system message for the given agents"""
+    # Create the description string for only available agents
+    available_agents_desc = "\n".join(
+        f" - {name}: {_AGENT_DESCRIPTIONS.get(name, 'no description available')}"
+        for name in agent_names
+    )
+    return _PLANNER_SYSMSG.format(agents=available_agents_desc)
+
+
 def create_planner_agent(model_client, available_agent_names):
     """Create planner agent with knowledge of available agents
     
@@ -7,33 +42,15 @@ def create_planner_agent(model_client, available_agent_names):
         model_client: The model client to use
         available_agent_names: List of names of available agents
     """
-    print("Initializing planner agent...")
-    
-    # Create description of available agents for the planner's system message
-    agent_descriptions = {
-        "dialogue_agent": "for generating character-based dialogues",
-        "postgres_agent": "for querying the PostgreSQL database",
-        "formatter_agent": "for formatting data into clean, human-friendly responses"
-    }
-    
-    # Create the description string for only available agents
-    available_agents_desc = "\n".join([
-        f" - {name}: {agent_descriptions.get(name, 'no description available')}" 
-        for name in available_agent_names
-    ])
+    logger.debug("Initializing planner agent...")
     
     planner = AssistantAgent(
         name="planner",
         description="Creates plans to fulfill user requests by coordinating specialized agents",
         model_client=model_client,
-        system_message=(
-            f"You are a planner that assigns tasks to the following specialized agents:\n"
-            f"{available_agents_desc}\n\n"
-            "Respond concisely. Only invoke an agent if truly necessary. "
-            "Once an agent finishes its role (it signals with its termination message), do not invoke it again."
-            "When you have completed your part, please end your reply with [TERMINATE_ALL]."
-        )
+        model_client_stream=True,
+        system_message=_planner_system_message(tuple(available_agent_names))
     )
     
-    print("Planner agent initialized with knowledge of available agents:", available_agent_names)
+    logger.debug("Planner agent initialized with knowledge of available agents: %s", available_agent_names)
     return planner 
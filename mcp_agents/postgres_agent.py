@@ -1,91 +1,95 @@
 import os
+import logging
 from typing import List
+from urllib.parse import quote
 
 from autogen_agentchat.agents import AssistantAgent
-from autogen_ext.tools.mcp import StdioServerParams, mcp_server_tools
+from autogen_ext.tools.mcp import StdioServerParams
+
+from mcp_agents._mcp_cache import cached_mcp_tools
+
+logger = logging.getLogger(__name__)
+
+_POSTGRES_SYSMSG = (
+    "You are a database query assistant that retrieves data from PostgreSQL databases. "
+    "First, explore the available tables and their schema to understand the database structure. "
+    "Then execute appropriate SQL queries to retrieve the data needed for the user's question.\n\n"
+    "When retrieving records, limit results to 10 records by default unless specified otherwise. "
+    "If the user asks for the latest/most recent records, use ORDER BY with appropriate timestamp or ID column in descending order."
+    "Max records to return is 10. "
+    "Do not use * to retrieve all columns to avoid too much of information. if you need to use *, limit record to 1.\n\n"
+)
+
+# Connection settings are read once when the agent module is loaded (after .env);
+# they do not change between queries
+_PG_REQUIRED = ("POSTGRES_USER", "POSTGRES_PASSWORD", "POSTGRES_HOST", "POSTGRES_DB")
+_pg_env = {key: os.environ.get(key) for key in _PG_REQUIRED}
+_pg_env["POSTGRES_PORT"] = os.environ.get("POSTGRES_PORT", "5432")
+_pg_missing = [key for key in _PG_REQUIRED if not _pg_env[key]]
+
+_pg_address = f"{_pg_env['POSTGRES_HOST']}:{_pg_env['POSTGRES_PORT']}/{_pg_env['POSTGRES_DB']}?sslmode=require"
+# Characters such as @ or / in the credentials must be escaped to keep the URL valid
+_pg_user = quote(_pg_env["POSTGRES_USER"] or "", safe="")
+_pg_connection_string = f"postgresql://{_pg_user}:{quote(_pg_env['POSTGRES_PASSWORD'] or '', safe='')}@{_pg_address}"
+_pg_masked_connection_string = f"postgresql://{_pg_user}:****@{_pg_address}"
+
+_PG_SERVER_PARAMS = StdioServerParams(
+    command="npx",
+    args=[
+        "-y",
+        "@modelcontextprotocol/server-postgres",
+        _pg_connection_string
+    ]
+)
 
 async def get_postgres_tools() -> List:
     """Get MCP tools for PostgreSQL server"""
-    print("Getting PostgreSQL tools...")
-    
-    # Build connection string from environment variables
-    pg_user = os.getenv("POSTGRES_USER")
-    pg_password = os.getenv("POSTGRES_PASSWORD")
-    pg_host = os.getenv("POSTGRES_HOST")
-    pg_port = os.getenv("POSTGRES_PORT", "5432")
-    pg_db = os.getenv("POSTGRES_DB")
+    logger.debug("Getting PostgreSQL tools...")
     
-    # Validate required environment variables
-    missing_vars = []
-    if not pg_user:
-        missing_vars.append("POSTGRES_USER")
-    if not pg_password:
-        missing_vars.append("POSTGRES_PASSWORD")
-    if not pg_host:
-        missing_vars.append("POSTGRES_HOST")
-    if not pg_db:
-        missing_vars.append("POSTGRES_DB")
-        
-    if missing_vars:
-        raise ValueError(f"Missing required environment variables: {', '.join(missing_vars)}")
+    if _pg_missing:
+        raise ValueError(f"Missing required environment variables: {', '.join(_pg_missing)}")
     
-    # Build connection string
-    db_connection_string = f"postgresql://{pg_user}:{pg_password}@{pg_host}:{pg_port}/{pg_db}?sslmode=require"
-    print(f"Generated connection string (password hidden): postgresql://{pg_user}:****@{pg_host}:{pg_port}/{pg_db}?sslmode=require")
-    
-    server_params = StdioServerParams(
-        command="npx",
-        args=[
-            "-y",
-            "@modelcontextprotocol/server-postgres",
-            db_connection_string
-        ]
-    )
+    logger.debug("Generated connection string (password hidden): %s", _pg_masked_connection_string)
     
     try:
-        tools = await mcp_server_tools(server_params)
-        print(f"Found {len(tools)} PostgreSQL tools")
-        for tool in tools:
-            print(f"- Tool: {tool.name}")
+        # Reuses the running server and its tool list after the first call
+        tools = await cached_mcp_tools(_PG_SERVER_PARAMS)
+        logger.info("Found %d PostgreSQL tools", len(tools))
+        if logger.isEnabledFor(logging.DEBUG):
+            for tool in tools:
+                logger.debug("- Tool: %s", tool.name)
         return tools
     except Exception as e:
-        print(f"Error getting PostgreSQL tools: {e}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("Error getting PostgreSQL tools: %s", e)
         return []
 
 async def create_postgres_agent(model_client):
     """Create PostgreSQL agent with tools"""
-    print("Initializing PostgreSQL agent...")
+    logger.debug("Initializing PostgreSQL agent...")
     
     try:
         # Get PostgreSQL tools
         postgres_tools = await get_postgres_tools()
         
+        # Without its tools the agent cannot answer anything, and the planner
+        # would waste turns selecting it
+        if not postgres_tools:
+            logger.warning("No PostgreSQL tools found, PostgreSQL agent skipped")
+            return None
+        
         # Create PostgreSQL agent with tools
         postgres_agent = AssistantAgent(
             name="postgres_agent",
             description="Retrieves and analyzes data from PostgreSQL databases. Can explore database schemas and run SQL queries.",
             model_client=model_client,
-            tools=postgres_tools if postgres_tools else None,
-            system_message=(
-                "You are a database query assistant that retrieves data from PostgreSQL databases. "
-                "First, explore the available tables and their schema to understand the database structure. "
-                "Then execute appropriate SQL queries to retrieve the data needed for the user's question.\n\n"
-                "When retrieving records, limit results to 10 records by default unless specified otherwise. "
-                "If the user asks for the latest/most recent records, use ORDER BY with appropriate timestamp or ID column in descending order."
-                "Max records to return is 10. "
-                "Do not use * to retrieve all columns to avoid too much of information. if you need to use *, limit record to 1.\n\n"
-            )
+            model_client_stream=True,
+            tools=postgres_tools,
+            system_message=_POSTGRES_SYSMSG
         )
         
-        if postgres_tools:
-            print("PostgreSQL agent initialized with tools")
-        else:
-            print("No PostgreSQL tools found, agent created without tools")
-            
+        logger.debug("PostgreSQL agent initialized with tools")
         return postgres_agent
         
     except ValueError as e:
-        print(f"PostgreSQL agent initialization skipped: {e}")
+        logger.warning("PostgreSQL agent initialization skipped: %s", e)
         return None 
@@ -0,0 +1,188 @@
+"""
+Semantic response cache for the multi-agent chat system.
+"""
+import hashlib
+import json
+import logging
+import math
+import os
+import time
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+EmbedFn = Callable[[str], Awaitable[List[float]]]
+
+
+def _normalize_query(query: str) -> str:
+    """Lower-case the query and collapse whitespace so trivial variations share a key"""
+    return " ".join(query.lower().split())
+
+
+def _unit_vector(vector: List[float]) -> List[float]:
+    """L2-normalize a vector so a dot product equals cosine similarity"""
+    norm = math.sqrt(sum(x * x for x in vector))
+    if not norm:
+        return list(vector)
+    return [x / norm for x in vector]
+
+
+class SemanticCache:
+    """
+    Caches final responses keyed on the user's query.
+
+    Exact repeats are answered from a hash lookup without any model call. When an
+    embedding function is provided, paraphrased queries are matched by cosine
+    similarity against previously answered queries.
+
+    Every entry belongs to a scope (e.g. the set of enabled agents) and is only
+    returned for lookups in the same scope.
+    """
+
+    def __init__(self, embed_fn: Optional[EmbedFn] = None, threshold: float = 0.92,
+                 path: Optional[str] = None, ttl: Optional[float] = None):
+        """
+        Initialize the cache.
+
+        Args:
+            embed_fn: Optional async function returning an embedding for a query
+            threshold: Minimum cosine similarity for a semantic hit
+            path: Optional JSON file used to persist the cache between runs
+            ttl: Seconds an entry is served for; None keeps entries indefinitely
+        """
+        self.embed_fn = embed_fn
+        self.threshold = threshold
+        self.path = path
+        self.ttl = ttl
+        # Cache key -> (response, time stored)
+        self.exact: Dict[str, Tuple[str, float]] = {}
+        # Rows of the embedding matrix and their (scope, query, response, time stored)
+        self.matrix: List[List[float]] = []
+        self.entries: List[Tuple[str, str, str, float]] = []
+        # Embeddings computed during a missed lookup, reused when the response is stored
+        self._pending: Dict[str, List[float]] = {}
+
+        if self.path:
+            self._load()
+
+    @staticmethod
+    def _key(scope: str, normalized: str) -> str:
+        return hashlib.sha256(f"{scope}\0{normalized}".encode("utf-8")).hexdigest()
+
+    def _expired(self, stored_at: float) -> bool:
+        return self.ttl is not None and time.time() - stored_at > self.ttl
+
+    async def lookup(self, query: str, scope: str = "") -> Optional[str]:
+        """
+        Return a cached response for the query, or None on a miss.
+
+        After a miss, call store() or discard() once the query has been answered.
+
+        Args:
+            query: The user's query
+            scope: Scope the response must have been stored in
+
+        Returns:
+            The cached response or None
+        """
+        normalized = _normalize_query(query)
+        key = self._key(scope, normalized)
+
+        # Zero-cost exact hit before any embedding work
+        entry = self.exact.get(key)
+        if entry is not None:
+            if not self._expired(entry[1]):
+                return entry[0]
+            del self.exact[key]
+
+        if not self.embed_fn:
+            return None
+
+        try:
+            vector = _unit_vector(await self.embed_fn(normalized))
+        except Exception as e:
+            logger.warning("Error computing query embedding: %s", e)
+            return None
+
+        best_index, best_score = -1, -1.0
+        for index, row in enumerate(self.matrix):
+            entry_scope, _, _, stored_at = self.entries[index]
+            if entry_scope != scope or self._expired(stored_at):
+                continue
+            score = sum(a * b for a, b in zip(row, vector))
+            if score > best_score:
+                best_index, best_score = index, score
+
+        if best_score >= self.threshold:
+            return self.entries[best_index][2]
+
+        self._pending[key] = vector
+        return None
+
+    async def store(self, query: str, response: str, scope: str = ""):
+        """
+        Store a response for the query. Call only after a successful completion.
+
+        Args:
+            query: The user's query
+            response: The final response to cache
+            scope: Scope the response is valid in
+        """
+        normalized = _normalize_query(query)
+        key = self._key(scope, normalized)
+        stored_at = time.time()
+        self.exact[key] = (response, stored_at)
+
+        if self.embed_fn:
+            vector = self._pending.pop(key, None)
+            if vector is None:
+                try:
+                    vector = _unit_vector(await self.embed_fn(normalized))
+                except Exception as e:
+                    logger.warning("Error computing query embedding: %s", e)
+            if vector is not None:
+                self._drop_expired_rows()
+                self.matrix.append(vector)
+                self.entries.append((scope, query, response, stored_at))
+
+        if self.path:
+            self._save()
+
+    def discard(self, query: str, scope: str = ""):
+        """Forget the embedding kept from a missed lookup whose query was not answered"""
+        self._pending.pop(self._key(scope, _normalize_query(query)), None)
+
+    def _drop_expired_rows(self):
+        """Remove expired rows from the embedding matrix"""
+        if self.ttl is None:
+            return
+        kept = [index for index, entry in enumerate(self.entries) if not self._expired(entry[3])]
+        if len(kept) < len(self.entries):
+            self.matrix = [self.matrix[index] for index in kept]
+            self.entries = [self.entries[index] for index in kept]
+
+    def _load(self):
+        """Load persisted entries if the cache file exists"""
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                data = json.load(f)
+            self.exact = {key: (response, stored_at) for key, (response, stored_at) in data.get("exact", {}).items()}
+            self.matrix = data.get("matrix", [])
+            self.entries = [tuple(entry) for entry in data.get("entries", [])]
+            if len(self.matrix) != len(self.entries):
+                raise ValueError("embedding rows do not match entries")
+            logger.info("Loaded %d cached responses from %s", len(self.exact), self.path)
+        except Exception as e:
+            self.exact, self.matrix, self.entries = {}, [], []
+            logger.warning("Error loading response cache from %s: %s", self.path, e)
+
+    def _save(self):
+        """Persist the cache so it survives restarts"""
+        exact = {key: list(entry) for key, entry in self.exact.items() if not self._expired(entry[1])}
+        try:
+            with open(self.path, "w", encoding="utf-8") as f:
+                json.dump({"exact": exact, "matrix": self.matrix, "entries": self.entries}, f)
+        except Exception as e:
+            logger.warning("Error saving response cache to %s: %s", self.path, e)
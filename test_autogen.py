@@ -3,9 +3,9 @@
 Test script for demonstrating the AutoGen-based agent selection system.
 """
 
-import asyncio
 import sys
-from autogen_agent import AgentSelector
+from autogen_agent import process_query, close_chat
+from mcp_agents.logging_utils import create_runner, setup_logging
 
 async def main():
     """
@@ -23,20 +23,23 @@ async def main():
             "What are the table structures in the database?"
         ]
     
-    # Process each query
-    agent_selector = AgentSelector()
-    
-    for query in queries:
-        print("\n" + "="*50)
-        print(f"Query: {query}")
-        print("="*50)
-        
-        response = await agent_selector.process_query(query)
-        
-        print("\nResponse:")
-        print("-"*50)
-        print(response)
-        print("-"*50)
+    # Process each query through the shared, cached agent team
+    try:
+        for query in queries:
+            print("\n" + "="*50)
+            print(f"Query: {query}")
+            print("="*50)
+            
+            response, _, _, _ = await process_query(query)
+            
+            print("\nResponse:")
+            print("-"*50)
+            print(response)
+            print("-"*50)
+    finally:
+        await close_chat()
 
 if __name__ == "__main__":
-    asyncio.run(main()) 
+    setup_logging()
+    with create_runner() as runner:
+        runner.run(main()) 